@@ -0,0 +1,166 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .metrics import BATCH_SIZE
+from .scoring import DEFAULT_MAX_ROWS_PER_CHUNK, score_families
+
+
+class _Pending:
+    __slots__ = ("model", "features", "aggregated", "present", "future", "enqueued_at")
+
+    def __init__(self, model, features: np.ndarray, aggregated: np.ndarray, present: np.ndarray):
+        self.model = model
+        self.features = features
+        self.aggregated = aggregated
+        self.present = present
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones de recomendación concurrentes: espera hasta 'window_ms'
+    o hasta 'max_batch' peticiones, apila sus matrices de predicción, llama
+    al modelo una vez y reparte los scores a cada petición. Con 'executor'
+    (InferenceExecutor) cada lote se predice en su pool como un solo trabajo,
+    con su nthread, afinidad y control de admisión.
+    """
+
+    def __init__(
+        self,
+        manager,
+        window_ms: float = 3.0,
+        max_batch: int = 32,
+        max_rows_per_chunk: int = DEFAULT_MAX_ROWS_PER_CHUNK,
+        executor=None,
+    ):
+        self.manager = manager
+        self.executor = executor
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.max_rows_per_chunk = max_rows_per_chunk
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_seen = 0
+        self.total_wait_seconds = 0.0
+        self.batch_size_counts: Dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0 and self.max_batch > 1
+
+    def submit(self, model, features: np.ndarray, aggregated: np.ndarray, present: np.ndarray) -> Future:
+        """
+        Encola una familia y devuelve un Future con sus scores sobre todo el
+        catálogo. No bloquea: desde el event loop se espera con asyncio.wrap_future
+        (esperarlo dentro de un hilo del pool limitaría el lote al tamaño del pool).
+        """
+        self._ensure_started()
+        item = _Pending(model, features, aggregated, present)
+        self._queue.put(item)
+        return item.future
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                    self._thread.start()
+
+    def _collect(self) -> List[_Pending]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            # Solo se apilan peticiones que usan el mismo modelo y el mismo snapshot del catálogo
+            groups: Dict[tuple, List[_Pending]] = {}
+            for item in batch:
+                groups.setdefault((id(item.model), id(item.features)), []).append(item)
+            for items in groups.values():
+                args = (
+                    self.manager,
+                    items[0].model,
+                    items[0].features,
+                    [it.aggregated for it in items],
+                    [it.present for it in items],
+                    self.max_rows_per_chunk,
+                )
+                if self.executor is None:
+                    future: Future = Future()
+                    try:
+                        future.set_result(score_families(*args))
+                    except Exception as e:
+                        future.set_exception(e)
+                else:
+                    try:
+                        # No se espera el lote: el hilo sigue juntando el siguiente mientras el pool predice
+                        future = self.executor.submit(score_families, *args)
+                    except Exception as e:
+                        # Pool saturado (ExecutorOverloaded): todas las peticiones del lote lo reciben
+                        future = Future()
+                        future.set_exception(e)
+                future.add_done_callback(lambda f, items=items: self._deliver(items, f))
+            self._record(batch, started)
+
+    @staticmethod
+    def _deliver(items: List[_Pending], future: Future):
+        error = future.exception()
+        results = [None] * len(items) if error is not None else future.result()
+        for it, s in zip(items, results):
+            # Una petición cuyo cliente se desconectó ya tiene su Future cancelado:
+            # se salta sin cortar la entrega al resto del lote
+            if it.future.done():
+                continue
+            try:
+                if error is not None:
+                    it.future.set_exception(error)
+                else:
+                    it.future.set_result(s)
+            except InvalidStateError:
+                # Cancelado entre la comprobación y la entrega
+                pass
+
+    def _record(self, batch: List[_Pending], started: float):
+        BATCH_SIZE.observe(len(batch), source="microbatch")
+        with self._stats_lock:
+            size = len(batch)
+            self.batches += 1
+            self.requests += size
+            self.max_batch_seen = max(self.max_batch_seen, size)
+            self.total_wait_seconds += sum(started - it.enqueued_at for it in batch)
+            self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "window_ms": self.window_ms,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "requests": self.requests,
+                "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "max_batch_seen": self.max_batch_seen,
+                "avg_wait_ms": 1000.0 * self.total_wait_seconds / self.requests if self.requests else 0.0,
+                "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            }
@@ -0,0 +1,254 @@
+"""
+Captura de tráfico real para reproducirlo después (api/benchmarks/replay.py).
+
+CaptureMiddleware es un middleware ASGI que copia el cuerpo de la petición,
+los parámetros de consulta, el código, la duración y las recomendaciones
+devueltas de los endpoints elegidos. El trabajo en la petición se limita a
+guardar los bytes; el hilo de TrafficCapture los sanea y los escribe como
+NDJSON en 'capture_<pid>.ndjson', rotando el archivo por tamaño.
+
+Saneamiento: no se guardan encabezados (tokens, claves de idempotencia), los
+nombres de los miembros se reemplazan, solo se conservan los parámetros de
+consulta conocidos y el origen del filtro por distancia se redondea.
+"""
+import os
+import logging
+import json
+import time
+import atexit
+import random
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+CAPTURED_ENDPOINTS = ("recommend_destinations", "save_family_record")
+# Parámetros de consulta que se conservan; el resto (p. ej. 'profile') se descarta
+QUERY_PARAMS = ("top_k", "max_km", "provincia", "canton", "parroquia")
+ROUNDED_QUERY_PARAMS = ("origin_lat", "origin_lon")
+# Decimales del origen (~1 km)
+ORIGIN_DECIMALS = 2
+
+
+def sanitize_query(query_string: bytes) -> Dict[str, str]:
+    query = {}
+    for key, value in parse_qsl(query_string.decode("latin-1")):
+        if key in QUERY_PARAMS:
+            query[key] = value
+        elif key in ROUNDED_QUERY_PARAMS:
+            try:
+                query[key] = str(round(float(value), ORIGIN_DECIMALS))
+            except ValueError:
+                continue
+    return query
+
+
+def sanitize_body(endpoint: str, body: bytes) -> Any:
+    """
+    Cuerpo JSON sin datos personales: solo rol y preferencias de cada miembro
+    """
+    try:
+        payload = json.loads(body) if body else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if endpoint == "recommend_destinations" and isinstance(payload, dict):
+        miembros = payload.get("miembros") or []
+        payload = {"miembros": [
+            {
+                "nombre": f"Miembro {i + 1}",
+                "rol": member.get("rol"),
+                "preferencias": member.get("preferencias") or {},
+            }
+            for i, member in enumerate(miembros) if isinstance(member, dict)
+        ]}
+    return payload
+
+
+def summarize_response(endpoint: str, status: int, body: bytes) -> Optional[List[Dict[str, Any]]]:
+    """
+    Recomendaciones devueltas (nombre, provincia, cantón y score) para comparar versiones
+    """
+    if endpoint != "recommend_destinations" or status != 200:
+        return None
+    try:
+        recommendations = json.loads(body).get("recommendations", [])
+    except (ValueError, AttributeError, UnicodeDecodeError):
+        return None
+    return [
+        {key: rec.get(key) for key in ("nombre", "provincia", "canton", "predicted_score")}
+        for rec in recommendations
+    ]
+
+
+class TrafficCapture:
+    """
+    Buffer de peticiones capturadas que un hilo escribe por lotes en NDJSON
+    con rotación por tamaño (capture_<pid>.ndjson, .1, .2, ...)
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 50 * 2**20,
+        backups: int = 5,
+        sample_rate: float = 1.0,
+        flush_interval: float = 1.0,
+        max_buffer: int = 10000,
+    ):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.captured = 0
+        self.dropped = 0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"capture_{os.getpid()}.ndjson")
+
+    def should_capture(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def add(self, raw: Dict[str, Any]):
+        """
+        Encola una petición sin sanear; si el buffer está lleno se descarta
+        """
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(raw)
+
+    @staticmethod
+    def to_entry(raw: Dict[str, Any]) -> Dict[str, Any]:
+        endpoint = raw["endpoint"]
+        entry = {
+            "ts": raw["ts"],
+            "endpoint": endpoint,
+            "method": raw["method"],
+            "path": raw["path"],
+            "query": sanitize_query(raw["query_string"]),
+            "body": sanitize_body(endpoint, raw["body"]),
+            "status": raw["status"],
+            "duration_ms": round(raw["duration"] * 1000.0, 3),
+            "pid": os.getpid(),
+        }
+        recommendations = summarize_response(endpoint, raw["status"], raw["response"])
+        if recommendations is not None:
+            entry["recommendations"] = recommendations
+        return entry
+
+    def _rotate(self):
+        path = self.path
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            lines = "".join(json.dumps(self.to_entry(raw), ensure_ascii=False) + "\n" for raw in batch)
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path
+            if os.path.exists(path) and os.path.getsize(path) + len(lines) > self.max_bytes:
+                self._rotate()
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
+            self.captured += len(batch)
+            return len(batch)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error al escribir la captura de tráfico: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {"buffered": buffered, "captured": self.captured, "dropped": self.dropped, "path": self.path}
+
+
+class CaptureMiddleware:
+    """
+    Middleware ASGI: copia petición y respuesta de los endpoints capturados sin
+    cambiar lo que recibe la aplicación ni lo que se envía al cliente
+    """
+
+    def __init__(self, app, capture: TrafficCapture, prefix: str = "/api/family",
+                 endpoints: Iterable[str] = CAPTURED_ENDPOINTS):
+        self.app = app
+        self.capture = capture
+        self.paths = {f"{prefix}/{endpoint}": endpoint for endpoint in endpoints}
+
+    async def __call__(self, scope, receive, send):
+        endpoint = self.paths.get(scope.get("path")) if scope["type"] == "http" else None
+        if endpoint is None or not self.capture.should_capture():
+            await self.app(scope, receive, send)
+            return
+
+        ts = time.time()
+        start = time.perf_counter()
+        request_chunks: List[bytes] = []
+        response_chunks: List[bytes] = []
+        status = 500
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_chunks.append(message.get("body", b""))
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and endpoint == "recommend_destinations":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            self.capture.add({
+                "ts": ts,
+                "endpoint": endpoint,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope.get("query_string", b""),
+                "body": b"".join(request_chunks),
+                "status": status,
+                "duration": time.perf_counter() - start,
+                "response": b"".join(response_chunks),
+            })
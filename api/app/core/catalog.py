@@ -0,0 +1,205 @@
+import os
+import logging
+import hashlib
+import threading
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .destinations import ensure_destination_catalog
+from .geo import GeoGridIndex
+from .inverted_index import REGION_COLUMNS, InvertedIndex
+from .storage import CategoricalColumn, ensure_columnar, load_columnar
+
+logger = logging.getLogger(__name__)
+
+# Columnas descriptivas que se devuelven junto con cada recomendación
+METADATA_COLUMNS = ["nombre", "provincia", "canton", "parroquia", "lat", "lon"]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    Vista inmutable del catálogo de destinos: bloque float32 contiguo de
+    características, columnas descriptivas alineadas por fila (los textos
+    como códigos + diccionario) e índices para filtrar candidatos
+    """
+    features: np.ndarray
+    metadata: Dict[str, Union[CategoricalColumn, np.ndarray]]
+    geo_index: GeoGridIndex
+    region_index: InvertedIndex
+    signature: str
+    version: int
+
+    def __len__(self) -> int:
+        return self.features.shape[0]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Bytes ocupados por cada parte del snapshot
+        """
+        usage = {"features": int(self.features.nbytes)}
+        for col, values in self.metadata.items():
+            usage[col] = int(values.nbytes)
+        usage["geo_index"] = self.geo_index.nbytes
+        usage["region_index"] = self.region_index.nbytes
+        return usage
+
+
+class DestinationCatalog:
+    """
+    Mantiene en memoria la tabla de destinos y la recarga en segundo plano
+    cuando el archivo cambia. Las peticiones solo leen el snapshot actual.
+    Con 'source_path' el catálogo se deriva (deduplicado) de ese dataset de
+    entrenamiento y se vigila ese archivo en lugar del catálogo.
+    """
+
+    def __init__(
+        self,
+        data_path: str,
+        feature_columns: List[str],
+        poll_interval: float = 5.0,
+        convert_lock: Optional[Callable] = None,
+        geo_cell_deg: float = 0.1,
+        source_path: Optional[str] = None,
+    ):
+        self.data_path = os.path.abspath(data_path)
+        self.source_path = os.path.abspath(source_path) if source_path else None
+        self.watch_path = self.source_path or self.data_path
+        self.feature_columns = list(feature_columns)
+        self.poll_interval = poll_interval
+        self.geo_cell_deg = geo_cell_deg
+        # Bloqueo opcional entre procesos para la conversión a formato columnar
+        self.convert_lock = convert_lock or nullcontext
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._stat: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._on_reload: List[Callable[[int], None]] = []
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("El catálogo no ha sido cargado. Llama a 'load()' primero.")
+        return snapshot
+
+    def add_reload_listener(self, callback: Callable[[int], None]):
+        """
+        Registra una función que se llama con la nueva versión tras cada recarga
+        """
+        self._on_reload.append(callback)
+
+    def _file_stat(self) -> Tuple[int, int]:
+        st = os.stat(self.watch_path)
+        return st.st_mtime_ns, st.st_size
+
+    def _file_hash(self) -> str:
+        sha = hashlib.sha1()
+        with open(self.watch_path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def _build_snapshot(self, signature: str, version: int) -> CatalogSnapshot:
+        # Matriz de características leída del almacenamiento columnar (memory-map, solo lectura)
+        with self.convert_lock():
+            if self.source_path:
+                ensure_destination_catalog(self.source_path, self.feature_columns, self.data_path)
+            directory = ensure_columnar(self.data_path, self.feature_columns)
+        features, columns, _ = load_columnar(directory)
+        n_rows = features.shape[0]
+        metadata = {}
+        for col in METADATA_COLUMNS:
+            values = columns.get(col)
+            if values is None:
+                metadata[col] = CategoricalColumn(np.full(n_rows, -1, dtype=np.int32), [])
+            elif isinstance(values, tuple):
+                # Los textos no se decodifican: solo las filas del top-k se leen
+                metadata[col] = CategoricalColumn(*values)
+            else:
+                metadata[col] = values
+        # Índices construidos una vez por versión del catálogo
+        lats = metadata["lat"] if isinstance(metadata["lat"], np.ndarray) else np.full(n_rows, np.nan)
+        lons = metadata["lon"] if isinstance(metadata["lon"], np.ndarray) else np.full(n_rows, np.nan)
+        geo_index = GeoGridIndex(lats, lons, self.geo_cell_deg)
+        # El índice guarda su propia copia float64 para el filtro por radio y las
+        # distancias; en el snapshot lat/lon solo son descriptivas y bastan en float32
+        for col in ("lat", "lon"):
+            if isinstance(metadata[col], np.ndarray):
+                metadata[col] = metadata[col].astype(np.float32)
+        region_index = InvertedIndex({
+            col: (metadata[col].codes, metadata[col].categories)
+            for col in REGION_COLUMNS
+            if isinstance(metadata[col], CategoricalColumn)
+        })
+        return CatalogSnapshot(
+            features=features,
+            metadata=metadata,
+            geo_index=geo_index,
+            region_index=region_index,
+            signature=signature,
+            version=version,
+        )
+
+    def load(self) -> CatalogSnapshot:
+        """
+        Carga (o recarga) el catálogo desde disco y reemplaza el snapshot de forma atómica
+        """
+        if not os.path.exists(self.watch_path):
+            raise FileNotFoundError(f"Archivo de catálogo no encontrado: {self.watch_path}")
+        with self._lock:
+            stat = self._file_stat()
+            signature = self._file_hash()
+            version = self._snapshot.version + 1 if self._snapshot is not None else 1
+            snapshot = self._build_snapshot(signature, version)
+            self._snapshot = snapshot
+            self._stat = stat
+        logger.info(f"Catálogo cargado (v{version}) con {len(snapshot)} destinos.")
+        for callback in self._on_reload:
+            callback(version)
+        return snapshot
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recarga el catálogo solo si el archivo cambió (mtime/tamaño y luego hash)
+        """
+        try:
+            stat = self._file_stat()
+        except FileNotFoundError:
+            return False
+        if stat == self._stat:
+            return False
+        if self._snapshot is not None and self._file_hash() == self._snapshot.signature:
+            # Se tocó el archivo pero el contenido es el mismo
+            self._stat = stat
+            return False
+        self.load()
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                # Si la recarga falla se sigue sirviendo el snapshot anterior
+                logger.error(f"Error al recargar el catálogo: {e}")
+
+    def start_watcher(self):
+        """
+        Inicia el hilo que vigila cambios en el archivo del catálogo
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.poll_interval)
+            self._watcher = None
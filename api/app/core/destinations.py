@@ -0,0 +1,124 @@
+"""
+Catálogo de destinos deduplicado, separado de las filas de entrenamiento.
+
+El dataset de entrenamiento mezcla reseñas reales con filas sintéticas sin
+nombre ni coordenadas. El catálogo deja una fila por lugar con nombre
+(nombre + provincia + cantón + parroquia) con las calificaciones promediadas,
+y es la única tabla que se puntúa en las peticiones.
+
+Uso como paso de construcción (desde la raíz del repositorio):
+    python -m api.app.core.destinations data/datos_sintetico.csv [data/destinos.csv]
+"""
+import os
+import logging
+import sys
+import json
+from typing import List, Optional
+
+import pandas as pd
+
+from .storage import file_signature
+
+logger = logging.getLogger(__name__)
+
+# Columnas que identifican un lugar
+DESTINATION_KEY = ["nombre", "provincia", "canton", "parroquia"]
+# Nombre por defecto del catálogo junto al dataset de entrenamiento
+CATALOG_FILE = "destinos.csv"
+# Número de filas de entrenamiento que se agregaron en cada destino
+COUNT_COLUMN = "n_registros"
+
+
+def destination_catalog_path(data_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(data_path)), CATALOG_FILE)
+
+
+def _source_path(catalog_path: str) -> str:
+    return f"{catalog_path}.source.json"
+
+
+def is_derived_catalog(catalog_path: str) -> bool:
+    """
+    True si el catálogo lo construyó ensure_destination_catalog (tiene la firma
+    del dataset de origen); un catálogo sin firma es del operador y no se reescribe
+    """
+    return os.path.exists(_source_path(os.path.abspath(catalog_path)))
+
+
+def build_destination_catalog(df: pd.DataFrame, feature_columns: List[str]) -> pd.DataFrame:
+    """
+    Una fila por lugar con nombre: calificaciones y score promediados,
+    coordenadas del primer registro. Conserva el orden de aparición.
+    """
+    named = df[df["nombre"].notna() & (df["nombre"].astype(str).str.strip() != "")]
+    keys = [col for col in DESTINATION_KEY if col in named.columns]
+    aggregations = {col: "mean" for col in feature_columns if col in named.columns}
+    for col in ("lat", "lon"):
+        if col in named.columns:
+            aggregations[col] = "first"
+    if "score" in named.columns:
+        aggregations["score"] = "mean"
+    grouped = named.groupby(keys, sort=False, dropna=False)
+    catalog = grouped.agg(aggregations)
+    catalog[COUNT_COLUMN] = grouped.size()
+    catalog = catalog.reset_index()
+    # Mismo orden de columnas que el dataset de entrenamiento
+    order = [col for col in df.columns if col in catalog.columns] + [COUNT_COLUMN]
+    return catalog[order]
+
+
+def ensure_destination_catalog(
+    data_path: str,
+    feature_columns: List[str],
+    catalog_path: Optional[str] = None,
+    sep: str = "|",
+) -> str:
+    """
+    Devuelve la ruta del catálogo, construyéndolo si no existe o si el
+    dataset de entrenamiento cambió desde la última construcción
+    """
+    catalog_path = os.path.abspath(catalog_path or destination_catalog_path(data_path))
+    if not os.path.exists(data_path):
+        if os.path.exists(catalog_path):
+            return catalog_path
+        raise FileNotFoundError(f"Archivo de datos no encontrado: {data_path}")
+
+    signature = file_signature(data_path, with_hash=False)
+    source = None
+    if os.path.exists(catalog_path) and os.path.exists(_source_path(catalog_path)):
+        with open(_source_path(catalog_path), encoding="utf-8") as fh:
+            source = json.load(fh)
+        if source.get("size") == signature["size"] and source.get("mtime_ns") == signature["mtime_ns"]:
+            return catalog_path
+    signature = file_signature(data_path)
+    if source is not None and source.get("sha1") == signature["sha1"]:
+        # Mismo contenido con otra fecha: solo se actualiza la firma
+        _write_source(catalog_path, signature)
+        return catalog_path
+
+    df = pd.read_csv(data_path, sep=sep)
+    catalog = build_destination_catalog(df, feature_columns)
+    tmp_path = f"{catalog_path}.{os.getpid()}.tmp"
+    catalog.to_csv(tmp_path, sep=sep, index=False)
+    os.replace(tmp_path, catalog_path)
+    _write_source(catalog_path, signature)
+    logger.info(f"Catálogo de destinos construido en {catalog_path}: {len(catalog)} destinos de {len(df)} filas.")
+    return catalog_path
+
+
+def _write_source(catalog_path: str, signature: dict):
+    tmp_path = f"{_source_path(catalog_path)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(signature, fh)
+    os.replace(tmp_path, _source_path(catalog_path))
+
+
+if __name__ == "__main__":
+    from .logs import configure_logging
+    from .model_manager import RATING_COLUMNS
+
+    configure_logging()
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    ensure_destination_catalog(sys.argv[1], RATING_COLUMNS, sys.argv[2] if len(sys.argv) > 2 else None)
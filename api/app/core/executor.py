@@ -0,0 +1,139 @@
+import os
+import logging
+import asyncio
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import xgboost
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorOverloaded(Exception):
+    """
+    La cola de inferencia está llena; el cliente debe reintentar más tarde
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__("Servidor de inferencia saturado")
+        self.retry_after = retry_after
+
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """
+    Convierte '0-3,6' en [0, 1, 2, 3, 6]
+    """
+    cpus: List[int] = []
+    for part in (p.strip() for p in spec.split(",")):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+class InferenceExecutor:
+    """
+    Pool acotado de hilos para las predicciones. Cada hilo fija los hilos
+    OpenMP de XGBoost ('nthread') y opcionalmente su afinidad de CPU, de modo
+    que pool_size x nthread no sobrepase los núcleos disponibles. Aplica
+    control de admisión: con la cola llena rechaza en lugar de encolar.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 2,
+        nthread: int = 0,
+        max_queue: int = 64,
+        cpu_affinity: Optional[List[int]] = None,
+        retry_after: int = 1,
+    ):
+        self.pool_size = max(1, pool_size)
+        self.nthread = nthread
+        self.max_queue = max_queue
+        self.cpu_affinity = cpu_affinity or []
+        self.retry_after = retry_after
+        self._worker_ids = itertools.count()
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.pool_size,
+            thread_name_prefix="inference",
+            initializer=self._init_worker,
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_in_flight_seen = 0
+
+    def _init_worker(self):
+        worker_id = next(self._worker_ids)
+        if self.nthread > 0:
+            # La configuración global de XGBoost es local a cada hilo
+            xgboost.set_config(nthread=self.nthread)
+        if self.cpu_affinity and hasattr(os, "sched_setaffinity"):
+            # Repartir la lista de CPUs en bloques contiguos, uno por hilo
+            per_worker = max(1, len(self.cpu_affinity) // self.pool_size)
+            start = (worker_id * per_worker) % len(self.cpu_affinity)
+            cpus = set(self.cpu_affinity[start:start + per_worker])
+            try:
+                os.sched_setaffinity(0, cpus)
+            except OSError as e:
+                logger.warning(f"No se pudo fijar la afinidad de CPU {sorted(cpus)}: {e}")
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.pool_size + self.max_queue:
+                self.rejected += 1
+                raise ExecutorOverloaded(self.retry_after)
+            self._in_flight += 1
+            self.max_in_flight_seen = max(self.max_in_flight_seen, self._in_flight)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        """
+        Encola 'fn' en el pool y devuelve su Future. Cada llamada ocupa un cupo
+        de admisión hasta que termina; lanza ExecutorOverloaded si la cola ya está llena.
+        """
+        self._admit()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Se libera el cupo cuando termina el trabajo, aunque el cliente se haya desconectado
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """
+        Ejecuta 'fn' en el pool y espera su resultado sin bloquear el event loop.
+        Lanza ExecutorOverloaded si la cola ya está llena.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "pool_size": self.pool_size,
+            "nthread": self.nthread,
+            "max_queue": self.max_queue,
+            "cpu_affinity": self.cpu_affinity,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.pool_size),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "max_in_flight_seen": self.max_in_flight_seen,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
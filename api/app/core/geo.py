@@ -0,0 +1,86 @@
+from typing import Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Kilómetros por grado de latitud
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Distancia en km desde un origen a cada punto (vectorizada)
+    """
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GeoGridIndex:
+    """
+    Índice espacial de celdas fijas (cell_deg x cell_deg grados). Las filas se
+    ordenan por celda y cada celda guarda un rango contiguo, así una consulta
+    por radio solo revisa las celdas que tocan la caja envolvente del círculo
+    y calcula la distancia exacta sobre esos candidatos.
+    Las filas sin coordenadas no entran en el índice.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, cell_deg: float = 0.1):
+        self.cell_deg = cell_deg
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        valid = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        cell_lat = np.floor(lats[valid] / cell_deg).astype(np.int64)
+        cell_lon = np.floor(lons[valid] / cell_deg).astype(np.int64)
+        order = np.lexsort((valid, cell_lon, cell_lat))
+        self.rows = valid[order].astype(np.int32)
+        self.lats = lats[self.rows]
+        self.lons = lons[self.rows]
+        cells = np.stack([cell_lat[order], cell_lon[order]], axis=1)
+        # Inicio de cada celda no vacía dentro de 'rows'
+        if len(cells):
+            boundaries = np.flatnonzero(np.any(cells[1:] != cells[:-1], axis=1)) + 1
+            self.starts = np.concatenate([[0], boundaries]).astype(np.int64)
+        else:
+            self.starts = np.empty(0, dtype=np.int64)
+        self.ends = np.append(self.starts[1:], len(self.rows)).astype(np.int64)
+        self.cell_lat = cells[self.starts, 0] if len(cells) else np.empty(0, dtype=np.int64)
+        self.cell_lon = cells[self.starts, 1] if len(cells) else np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.rows, self.lats, self.lons, self.starts, self.ends, self.cell_lat, self.cell_lon)
+        return int(sum(a.nbytes for a in arrays))
+
+    @property
+    def num_cells(self) -> int:
+        return len(self.starts)
+
+    def query_radius(self, lat: float, lon: float, max_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filas a menos de 'max_km' del origen, en orden de fila, y sus distancias en km
+        """
+        dlat = max_km / KM_PER_DEGREE
+        cos_lat = np.cos(np.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = 180.0 if cos_lat <= 1e-9 else min(180.0, max_km / (KM_PER_DEGREE * cos_lat))
+        lat_lo, lat_hi = np.floor((lat - dlat) / self.cell_deg), np.floor((lat + dlat) / self.cell_deg)
+        lon_lo, lon_hi = np.floor((lon - dlon) / self.cell_deg), np.floor((lon + dlon) / self.cell_deg)
+        cells = np.flatnonzero(
+            (self.cell_lat >= lat_lo) & (self.cell_lat <= lat_hi)
+            & (self.cell_lon >= lon_lo) & (self.cell_lon <= lon_hi)
+        )
+        if len(cells) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        # Posiciones de todas las celdas candidatas sin bucle en Python
+        lengths = self.ends[cells] - self.starts[cells]
+        offsets = np.repeat(self.starts[cells] - (np.cumsum(lengths) - lengths), lengths)
+        positions = np.arange(int(lengths.sum())) + offsets
+        distances = haversine_km(lat, lon, self.lats[positions], self.lons[positions])
+        keep = distances <= max_km
+        rows, distances = self.rows[positions[keep]], distances[keep]
+        order = np.argsort(rows, kind="stable")
+        return rows[order], distances[order]
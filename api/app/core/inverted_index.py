@@ -0,0 +1,77 @@
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Columnas de región indexadas en cada snapshot del catálogo
+REGION_COLUMNS = ["provincia", "canton", "parroquia"]
+
+
+def normalize_value(value: str) -> str:
+    """
+    Forma canónica de un valor de texto para buscarlo en el índice
+    """
+    return " ".join(str(value).split()).casefold()
+
+
+class InvertedIndex:
+    """
+    Índice invertido valor -> filas para columnas categóricas. Se arma a partir
+    de los códigos del almacenamiento columnar: las filas se ordenan por código
+    una sola vez y cada valor queda como un rango contiguo, de modo que una
+    búsqueda cuesta O(coincidencias). Las filas de cada valor están ordenadas.
+    """
+
+    def __init__(self, columns: Mapping[str, Tuple[np.ndarray, List[str]]]):
+        self._postings: Dict[str, Dict[str, np.ndarray]] = {}
+        for col, (codes, categories) in columns.items():
+            codes = np.asarray(codes)
+            order = np.argsort(codes, kind="stable").astype(np.int32)
+            counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+            # Las filas sin valor (código -1) quedan al inicio y se saltan
+            starts = np.concatenate([[0], np.cumsum(counts)]) + int(np.count_nonzero(codes < 0))
+            postings: Dict[str, np.ndarray] = {}
+            for code, value in enumerate(categories):
+                rows = order[starts[code]:starts[code + 1]]
+                key = normalize_value(value)
+                if key in postings:
+                    # Valores que solo difieren en mayúsculas/espacios se unen
+                    rows = np.union1d(postings[key], rows)
+                rows.setflags(write=False)
+                postings[key] = rows
+            self._postings[col] = postings
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._postings)
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(rows.nbytes for postings in self._postings.values() for rows in postings.values()))
+
+    def values(self, column: str) -> List[str]:
+        return list(self._postings.get(column, {}))
+
+    def lookup(self, column: str, value: str) -> np.ndarray:
+        """
+        Filas (ordenadas) cuyo valor en 'column' coincide con 'value'
+        """
+        postings = self._postings.get(column)
+        if postings is None:
+            raise KeyError(f"Columna no indexada: {column}")
+        return postings.get(normalize_value(value), np.empty(0, dtype=np.int32))
+
+    def query(self, **filters: Optional[str]) -> Optional[np.ndarray]:
+        """
+        Intersección de las filas de todos los filtros dados; None si no hay filtros
+        """
+        postings = [self.lookup(col, value) for col, value in filters.items() if value is not None]
+        if not postings:
+            return None
+        # Se empieza por la lista más corta para que cada intersección sea mínima
+        postings.sort(key=len)
+        rows = postings[0]
+        for other in postings[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
@@ -0,0 +1,17 @@
+"""
+Configuración del logging de la API. Con varios workers de uvicorn y el
+proceso de reentrenamiento, cada línea lleva el PID del proceso que la escribe.
+"""
+import os
+import logging
+from typing import Optional
+
+LOG_FORMAT = "%(asctime)s [%(process)d] %(name)s %(levelname)s: %(message)s"
+
+
+def configure_logging(level: Optional[str] = None):
+    """
+    Configura el logger raíz una sola vez por proceso (LOG_LEVEL, por defecto INFO)
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    logging.basicConfig(level=level, format=LOG_FORMAT)
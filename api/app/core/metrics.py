@@ -0,0 +1,354 @@
+"""
+Métricas del servicio en formato de texto de Prometheus, sin dependencias.
+
+Cada proceso acumula contadores, histogramas y gauges en memoria (un lock
+por métrica, sin E/S en el camino de la petición). Con varios workers de
+uvicorn, cada proceso vuelca periódicamente su estado a '<dir>/metrics_<pid>.json'
+y '/metrics' suma los contadores e histogramas de los procesos vivos; los
+gauges se publican por proceso con la etiqueta 'pid'. Los archivos de
+procesos terminados se ignoran y se borran al arrancar.
+"""
+import os
+import logging
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def collect(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = [[list(key), json.loads(json.dumps(value))] for key, value in self._values.items()]
+        return {"type": self.kind, "help": self.help, "labelnames": list(self.labelnames), "samples": samples}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def replace(self, value: float, **labels: Any):
+        """
+        Deja una sola serie: útil para gauges tipo 'info' (p. ej. versión del modelo)
+        """
+        with self._lock:
+            self._values = {self._key(labels): float(value)}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [conteos por bucket (no acumulados) + desbordamiento, suma, total]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> Dict[str, Any]:
+        data = super().collect()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class StageTimer:
+    """
+    Mide etapas consecutivas de una operación: cada 'mark' registra el tiempo
+    transcurrido desde la marca anterior
+    """
+
+    __slots__ = ("histogram", "operation", "_last")
+
+    def __init__(self, histogram: Histogram, operation: str):
+        self.histogram = histogram
+        self.operation = operation
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self.histogram.observe(elapsed, operation=self.operation, stage=stage)
+        self._last = now
+        return elapsed
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self.directory: Optional[str] = None
+        self.flush_interval = 5.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        return {name: metric.collect() for name, metric in self._metrics.items()}
+
+    # --- Modo multiproceso -------------------------------------------------
+
+    def _file(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics_{pid}.json")
+
+    def flush(self):
+        """
+        Vuelca el estado de este proceso al directorio compartido (reemplazo atómico)
+        """
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._file(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"pid": os.getpid(), "written_at": time.time(), "metrics": self.collect()}, fh)
+        os.replace(tmp_path, path)
+
+    def _load_processes(self) -> List[Tuple[int, Dict[str, Any]]]:
+        processes = [(os.getpid(), self.collect())]
+        if not self.directory or not os.path.isdir(self.directory):
+            return processes
+        for name in os.listdir(self.directory):
+            if not (name.startswith("metrics_") and name.endswith(".json")):
+                continue
+            try:
+                pid = int(name[len("metrics_"):-len(".json")])
+            except ValueError:
+                continue
+            if pid == os.getpid() or not _pid_alive(pid):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as fh:
+                    processes.append((pid, json.load(fh)["metrics"]))
+            except (OSError, ValueError, KeyError):
+                continue
+        return processes
+
+    def _remove_stale_files(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if not name.startswith("metrics_"):
+                continue
+            try:
+                pid = int(name[len("metrics_"):].split(".", 1)[0])
+            except ValueError:
+                continue
+            if not _pid_alive(pid):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f"Error al guardar métricas: {e}")
+
+    def start(self, directory: Optional[str], flush_interval: float = 5.0):
+        """
+        Activa el modo multiproceso: este proceso vuelca sus métricas cada 'flush_interval' segundos
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if not directory or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._remove_stale_files()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="metrics-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval)
+            self._thread = None
+        self.flush()
+
+    # --- Exposición --------------------------------------------------------
+
+    def render(self) -> str:
+        """
+        Texto en formato de exposición de Prometheus (versión 0.0.4)
+        """
+        processes = self._load_processes()
+        multiprocess = len(processes) > 1
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind == "gauge":
+                self._render_gauge(lines, name, metric, processes, multiprocess)
+            elif metric.kind == "counter":
+                for key, value in self._merge(name, processes).items():
+                    lines.append(f"{name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+            else:
+                self._render_histogram(lines, name, metric, processes)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _merge(name: str, processes: List[Tuple[int, Dict[str, Any]]]) -> Dict[Tuple[str, ...], float]:
+        merged: Dict[Tuple[str, ...], float] = {}
+        for _, metrics in processes:
+            for key, value in metrics.get(name, {}).get("samples", []):
+                merged[tuple(key)] = merged.get(tuple(key), 0.0) + value
+        return merged
+
+    @staticmethod
+    def _render_gauge(lines: List[str], name: str, metric: _Metric, processes, multiprocess: bool):
+        for pid, metrics in processes:
+            for key, value in metrics.get(name, {}).get("samples", []):
+                extra = f'pid="{pid}"' if multiprocess else ""
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+
+    @staticmethod
+    def _render_histogram(lines: List[str], name: str, metric: Histogram, processes):
+        merged: Dict[Tuple[str, ...], list] = {}
+        for _, metrics in processes:
+            data = metrics.get(name, {})
+            if list(data.get("buckets", [])) != list(metric.buckets):
+                continue
+            for key, (counts, total, count) in data.get("samples", []):
+                state = merged.setdefault(tuple(key), [[0] * len(counts), 0.0, 0])
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+        for key, (counts, total, count) in merged.items():
+            cumulative = 0
+            for bound, n in zip(list(metric.buckets) + [float("inf")], counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{name}_bucket{_format_labels(metric.labelnames, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(metric.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(metric.labelnames, key)} {count}")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def stage_timer(operation: str) -> StageTimer:
+    return StageTimer(STAGE_SECONDS, operation)
+
+
+# Registro global del proceso y métricas del servicio
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "family_stage_seconds",
+    "Duración de cada etapa de una operación (endpoint o entrenamiento)",
+    ["operation", "stage"],
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "family_request_seconds",
+    "Duración total de las peticiones HTTP",
+    ["method", "endpoint", "status"],
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "family_cache_requests_total",
+    "Consultas a la caché de recomendaciones por resultado (hit/miss)",
+    ["result"],
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "family_batch_size",
+    "Familias puntuadas en una misma llamada al modelo",
+    ["source"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+RECORDS_SAVED = REGISTRY.counter(
+    "family_records_saved_total",
+    "Registros nuevos recibidos por resultado (ok/duplicate)",
+    ["result"],
+)
+MODEL_INFO = REGISTRY.gauge(
+    "family_model_info",
+    "Versión del modelo en servicio (valor siempre 1)",
+    ["version"],
+)
+CATALOG_VERSION = REGISTRY.gauge(
+    "family_catalog_version",
+    "Versión del snapshot del catálogo de destinos en servicio",
+)
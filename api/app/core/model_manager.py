@@ -1,9 +1,24 @@
 import os
+import logging
+import csv
+import json
+import time
+import hashlib
+import threading
 import pandas as pd
 import numpy as np
 from typing import Dict, Any
+import xgboost
 from xgboost import XGBRegressor
 
+from .metrics import stage_timer
+from .record_log import RecordLog
+from .scoring import predict_matrix
+from .tree_compiler import compile_model
+from .storage import ensure_columnar, load_columnar_frame
+
+logger = logging.getLogger(__name__)
+
 # Columnas de calificación de atractivos (mismo orden que el CSV)
 RATING_COLUMNS = [
     "Calif promedio iglesias","Calif promedio resorts","Calif promedio playas","Calif promedio parques",
@@ -15,49 +30,436 @@ RATING_COLUMNS = [
     "Calif promedio miradores","Calif promedio monumentos","Calif promedio jardines"
 ]
 
+# Hiperparámetros del modelo (forman parte de la clave del artefacto guardado)
+MODEL_PARAMS = {
+    "n_estimators": 300,
+    "learning_rate": 0.05,
+    "max_depth": 6,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "reg_alpha": 0.1,
+    "reg_lambda": 1,
+    "objective": "reg:squarederror",
+    "random_state": 42,
+}
+
+# Validación de los candidatos del reentrenamiento: una fracción de los
+# registros nuevos y una muestra fija del histórico. Solo los modelos que se
+# comparan (ver retraining.train_candidate) entrenan sin ellas; el que se sirve usa todo.
+HOLDOUT_FRACTION = 0.1
+HOLDOUT_MAX_BASE_ROWS = 2000
+HOLDOUT_SEED = 0
+
+# Puntero (en MODEL_DIR) al último modelo que pasó la validación
+ACCEPTED_FILE = "accepted.json"
+
+# Columnas de los registros nuevos guardados desde la API
+RECORD_COLUMNS = RATING_COLUMNS + ["provincia","canton","parroquia","nombre","lat","lon","score (promedio preferencias)"]
+
 class ModelManager:
-    def __init__(self, data_path: str, new_data_path: str):
+    def __init__(self, data_path: str, new_data_path: str, model_dir: str | None = None):
         self.data_path = os.path.abspath(data_path)
         self.new_data_path = os.path.abspath(new_data_path)
+        # Carpeta de artefactos del modelo; por defecto junto a los datos
+        self.model_dir = os.path.abspath(model_dir or os.path.join(os.path.dirname(self.data_path), "models"))
         self.model: XGBRegressor | None = None
+        self.model_version: str | None = None
+        # Clave de los datos con los que se entrenó el modelo en servicio (ver artifact_key)
+        self.data_key: str | None = None
         self.is_trained = False
         self.feature_columns = RATING_COLUMNS.copy()
+        self.model_params = MODEL_PARAMS.copy()
+        # Registros nuevos que ya estaban incluidos en el modelo en servicio
+        self.trained_new_records = 0
+        # Actualizaciones incrementales acumuladas desde el último entrenamiento completo
+        self.incremental_updates = 0
+        # Escritura por lotes de los registros nuevos (el hilo se inicia con record_log.start())
+        self.record_log = RecordLog(self.new_data_path, RECORD_COLUMNS)
+        # Inferencia rápida: booster.inplace_predict sobre buffers float32 reutilizables
+        self.fast_inference = True
+        # Compara cada predicción rápida con la ruta sklearn/pandas (solo para diagnóstico)
+        self.verify_inference = False
+        self._buffers = threading.local()
+        self._inference_lock = threading.Lock()
+        self.fast_predictions = 0
+        self.reference_predictions = 0
+        self.verified_predictions = 0
+        self.prediction_mismatches = 0
+        # Duraciones (operación, etapa, segundos) del último entrenamiento, para
+        # reportarlas desde el proceso servidor cuando se entrena en otro proceso
+        self.train_timings: list = []
 
     def _load_data(self) -> pd.DataFrame:
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"Archivo de datos no encontrado: {self.data_path}")
-        df = pd.read_csv(self.data_path, sep="|")
+        # Se lee la versión columnar (memory-map); se genera desde el CSV si hace falta
+        df = load_columnar_frame(ensure_columnar(self.data_path, self.feature_columns))
         # Asegurar que existan todas las columnas de preferencias
         for col in self.feature_columns:
             if col not in df.columns:
                 df[col] = 0.0
         return df
 
-    def train_model(self):
+    def _load_new_records(self) -> pd.DataFrame:
+        """
+        Lee los registros guardados con 'save_new_record'. Si no traen score,
+        se usa el promedio de sus calificaciones (mismo criterio del dataset base).
+        """
+        if not os.path.exists(self.new_data_path) or os.path.getsize(self.new_data_path) == 0:
+            return pd.DataFrame(columns=self.feature_columns + ["score"])
+        df = pd.read_csv(self.new_data_path)
+        for col in self.feature_columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else 0.0
+        if "score" not in df.columns:
+            if "score (promedio preferencias)" in df.columns:
+                df["score"] = pd.to_numeric(df["score (promedio preferencias)"], errors="coerce")
+            else:
+                df["score"] = float("nan")
+            # Las calificaciones vacías siguen como NaN en las características
+            # (valor faltante para XGBoost), pero cuentan como 0 en el promedio,
+            # igual que en el ETL del dataset base
+            df["score"] = df["score"].fillna(df[self.feature_columns].fillna(0.0).mean(axis=1))
+        return df
+
+    def base_holdout_mask(self, n_rows: int) -> np.ndarray:
         """
-        Entrena el modelo con los datos históricos
+        Filas del dataset base reservadas para validar: una muestra fija
+        (misma semilla) de como máximo HOLDOUT_MAX_BASE_ROWS filas
+        """
+        mask = np.zeros(n_rows, dtype=bool)
+        n_holdout = min(HOLDOUT_MAX_BASE_ROWS, int(n_rows * HOLDOUT_FRACTION))
+        mask[np.random.default_rng(HOLDOUT_SEED).permutation(n_rows)[:n_holdout]] = True
+        return mask
+
+    def new_holdout_mask(self, n_rows: int) -> np.ndarray:
+        """
+        Registros nuevos reservados para validar. Cada fila se asigna con un
+        valor pseudoaleatorio según su posición, así que las filas ya
+        asignadas no cambian cuando el archivo crece.
+        """
+        return np.random.default_rng(HOLDOUT_SEED).random(n_rows) < HOLDOUT_FRACTION
+
+    def validation_data(self):
+        """
+        Conjunto de validación (X, y) en float64: la muestra reservada del
+        dataset base más los registros nuevos reservados
+        """
+        df_base = self._load_data()
+        df_new = self._load_new_records()
+        cols = self.feature_columns + ["score"]
+        df = pd.concat([
+            df_base.loc[self.base_holdout_mask(len(df_base)), cols],
+            df_new.loc[self.new_holdout_mask(len(df_new)), cols],
+        ], ignore_index=True)
+        return df[self.feature_columns].astype(np.float64), df["score"].to_numpy(dtype=np.float64)
+
+    def count_new_records(self) -> int:
+        """
+        Número de registros del archivo de registros nuevos (filas CSV sin el
+        encabezado, igual que las que devuelve '_load_new_records'; un campo
+        entre comillas con saltos de línea cuenta como una sola fila)
+        """
+        if not os.path.exists(self.new_data_path):
+            return 0
+        with open(self.new_data_path, "r", encoding="utf-8", newline="") as fh:
+            rows = sum(1 for row in csv.reader(fh) if row)
+        return max(0, rows - 1)
+
+    def _load_training_data(self, include_new_records: bool = True, exclude_holdout: bool = False):
+        """
+        Datos históricos más (opcionalmente) los registros nuevos guardados desde
+        la API; con 'exclude_holdout', sin las filas reservadas para validar.
+        Devuelve también cuántos registros nuevos se leyeron (posición desde la
+        que sigue el incremental).
         """
         df = self._load_data()
         if "score" not in df.columns:
             raise ValueError("Falta la columna 'score' en el dataset")
-        
+        df = df[self.feature_columns + ["score"]]
+        if exclude_holdout:
+            df = df.loc[~self.base_holdout_mask(len(df))]
+        df_new = self._load_new_records() if include_new_records else None
+        n_new = 0 if df_new is None else len(df_new)
+        if n_new:
+            df_new = df_new[self.feature_columns + ["score"]]
+            if exclude_holdout:
+                df_new = df_new.loc[~self.new_holdout_mask(n_new)]
+            df = pd.concat([df, df_new], ignore_index=True)
+        return df, n_new
+
+    def train_model(self, n_jobs: int | None = None, include_new_records: bool = True, exclude_holdout: bool = False):
+        """
+        Entrena el modelo con los datos históricos y los registros nuevos.
+        Sin 'include_new_records' solo usa el dataset base (modelo de arranque).
+        Con 'exclude_holdout' deja fuera las filas reservadas para validar
+        (gemelo de validación de un candidato; no se sirve).
+        """
+        timer = stage_timer("train_model")
+        # La clave se calcula antes de leer para que corresponda a los datos usados
+        key = self.artifact_key() if include_new_records else self.base_key()
+        df, n_new = self._load_training_data(include_new_records, exclude_holdout)
+
         X = df[self.feature_columns]
         y = df["score"].astype(float)
+        self.train_timings.append(("train_model", "load_data", timer.mark("load_data")))
+
+        model = XGBRegressor(**self.model_params, n_jobs=n_jobs)
+        model.fit(X, y)
+        self.train_timings.append(("train_model", "fit", timer.mark("fit")))
+        self.model = model
+        self.model_version = key
+        self.data_key = key
+        self.trained_new_records = n_new
+        self.incremental_updates = 0
+        self.is_trained = True
+        logger.info(f"Modelo entrenado con {len(df)} registros.")
+
+    def update_incremental(
+        self,
+        max_new_trees: int = 50,
+        full_rebuild_every: int = 10,
+        n_jobs: int | None = None,
+        exclude_holdout: bool = False,
+    ) -> bool:
+        """
+        Continúa el boosting del modelo actual usando solo los registros nuevos
+        que aún no vio. Agrega como máximo 'max_new_trees' árboles y cada
+        'full_rebuild_every' actualizaciones reentrena desde cero para evitar deriva.
+        Devuelve False si no había registros nuevos. La versión resultante es la
+        del último entrenamiento completo con el sufijo '-inc{n}'.
+        'exclude_holdout' como en train_model.
+        """
+        if not self.is_trained or self.model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+
+        timer = stage_timer("update_incremental")
+        key = self.artifact_key()
+        # 'trained_new_records' es una posición en las filas ya parseadas del CSV
+        df_new = self._load_new_records()
+        n_new = len(df_new)
+        if n_new == self.trained_new_records:
+            return False
+        if n_new < self.trained_new_records or self.incremental_updates >= full_rebuild_every:
+            # El archivo fue truncado o ya se acumularon demasiadas actualizaciones
+            self.train_model(n_jobs=n_jobs, exclude_holdout=exclude_holdout)
+            return True
+
+        df_delta = df_new.iloc[self.trained_new_records:]
+        if exclude_holdout:
+            df_delta = df_delta[~self.new_holdout_mask(n_new)[self.trained_new_records:]]
+        if df_delta.empty:
+            # Todos los registros nuevos quedaron reservados para validar
+            return False
+        X = df_delta[self.feature_columns]
+        y = df_delta["score"].astype(float)
+        self.train_timings.append(("update_incremental", "load_data", timer.mark("load_data")))
+
+        params = {**self.model_params, "n_estimators": max(1, min(max_new_trees, len(df_delta)))}
+        model = XGBRegressor(**params, n_jobs=n_jobs)
+        model.fit(X, y, xgb_model=self.model.get_booster())
+        self.train_timings.append(("update_incremental", "fit", timer.mark("fit")))
+        self.model = model
+        self.incremental_updates += 1
+        self.model_version = f"{self.model_version.split('-inc')[0]}-inc{self.incremental_updates}"
+        self.data_key = key
+        self.trained_new_records = n_new
+        self.is_trained = True
+        logger.info(f"Modelo actualizado con {len(df_delta)} registros nuevos (+{params['n_estimators']} árboles).")
+        return True
+
+    def artifact_key(self) -> str:
+        """
+        Hash de los datos de entrenamiento (base + registros nuevos), columnas e
+        hiperparámetros. Identifica el candidato que entrena el reentrenamiento.
+        """
+        return self._hash_key([self.data_path, self.new_data_path])
+
+    def base_key(self) -> str:
+        """
+        Como artifact_key, pero solo con el dataset base: identifica el modelo
+        de arranque, que no cambia al guardar registros nuevos
+        """
+        return self._hash_key([self.data_path])
 
-        self.model = XGBRegressor(
-            n_estimators=300,
-            learning_rate=0.05,
-            max_depth=6,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            reg_alpha=0.1,
-            reg_lambda=1,
-            objective="reg:squarederror",
-            random_state=42
+    def _hash_key(self, paths) -> str:
+        sha = hashlib.sha256()
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    sha.update(chunk)
+        config = {
+            "params": self.model_params,
+            "features": self.feature_columns,
+            "xgboost": xgboost.__version__,
+        }
+        sha.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+        return sha.hexdigest()[:16]
+
+    def artifact_path(self, key: str) -> str:
+        return os.path.join(self.model_dir, f"model_{key}.ubj")
+
+    def validation_path(self, key: str) -> str:
+        """
+        Gemelo de validación de la versión 'key': misma receta, sin las filas reservadas
+        """
+        return os.path.join(self.model_dir, f"model_{key}.holdout.ubj")
+
+    def save_validation_model(self, model: XGBRegressor, key: str | None = None) -> str:
+        key = key or self.model_version
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = self.validation_path(key)
+        tmp_path = os.path.join(self.model_dir, f".tmp_{os.getpid()}_{os.path.basename(path)}")
+        model.save_model(tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def load_validation_model(self, key: str) -> XGBRegressor | None:
+        path = self.validation_path(key)
+        if not os.path.exists(path):
+            return None
+        model = XGBRegressor()
+        model.load_model(path)
+        return model
+
+    def _metadata_path(self, key: str) -> str:
+        return os.path.join(self.model_dir, f"model_{key}.json")
+
+    def compiled_path(self, key: str) -> str:
+        return os.path.join(self.model_dir, f"model_{key}.forest.npz")
+
+    def export_compiled(self, path: str | None = None) -> str:
+        """
+        Exporta el modelo en servicio como bosque compilado de NumPy
+        (ver core/tree_compiler.py) para evaluarlo sin xgboost
+        """
+        if not self.is_trained or self.model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+        path = path or self.compiled_path(self.model_version)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(os.path.abspath(path)), f".tmp_{os.getpid()}_{os.path.basename(path)}")
+        compile_model(self.model).save(tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Modelo compilado guardado en {path}")
+        return path
+
+    def save_model(self) -> str:
+        """
+        Guarda el booster entrenado como artefacto versionado por su clave
+        """
+        if not self.is_trained or self.model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = self.artifact_path(self.model_version)
+        # Escribir en un temporal y renombrar para no dejar artefactos a medias
+        tmp_path = os.path.join(self.model_dir, f".tmp_{os.getpid()}_{os.path.basename(path)}")
+        self.model.save_model(tmp_path)
+        with open(self._metadata_path(self.model_version), "w", encoding="utf-8") as fh:
+            json.dump({
+                "version": self.model_version,
+                "data_key": self.data_key,
+                "trained_new_records": self.trained_new_records,
+                # Filas parseadas de NEW_DATA_PATH ya vistas: el incremental sigue desde aquí
+                "new_records_offset": self.trained_new_records,
+                "incremental_updates": self.incremental_updates,
+            }, fh)
+        os.replace(tmp_path, path)
+        logger.info(f"Modelo guardado en {path}")
+        return path
+
+    def load_model(self, key: str) -> bool:
+        """
+        Carga el artefacto con la clave indicada; devuelve False si no existe
+        """
+        path = self.artifact_path(key)
+        if not os.path.exists(path):
+            return False
+        metadata = {}
+        metadata_path = self._metadata_path(key)
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8") as fh:
+                metadata = json.load(fh)
+        model = XGBRegressor()
+        model.load_model(path)
+        self.swap_model(
+            model,
+            key,
+            metadata.get("new_records_offset", metadata.get("trained_new_records")),
+            metadata.get("incremental_updates", 0),
+            data_key=metadata.get("data_key", key),
         )
-        self.model.fit(X, y)
+        logger.info(f"Modelo cargado desde {path}")
+        return True
+
+    def swap_model(
+        self,
+        model: XGBRegressor,
+        version: str,
+        trained_new_records: int | None = None,
+        incremental_updates: int = 0,
+        data_key: str | None = None,
+    ):
+        """
+        Reemplaza el modelo en servicio. La asignación de la referencia es atómica:
+        las peticiones en curso terminan con el modelo que ya habían tomado.
+        """
+        self.model = model
+        self.model_version = version
+        self.data_key = data_key or version
+        self.trained_new_records = self.count_new_records() if trained_new_records is None else trained_new_records
+        self.incremental_updates = incremental_updates
         self.is_trained = True
-        print(f"Modelo entrenado con {len(df)} registros.")
+
+    def accepted_path(self) -> str:
+        return os.path.join(self.model_dir, ACCEPTED_FILE)
+
+    def mark_accepted(self):
+        """
+        Registra el modelo en servicio como el último aceptado (reemplazo atómico
+        del puntero). Su artefacto ya debe estar guardado con 'save_model'.
+        """
+        pointer = {
+            "version": self.model_version,
+            "data_key": self.data_key,
+            # Dataset base del modelo aceptado: si cambia, el puntero deja de valer
+            "base_key": self.base_key(),
+            "accepted_at": time.time(),
+        }
+        os.makedirs(self.model_dir, exist_ok=True)
+        tmp_path = f"{self.accepted_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(pointer, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self.accepted_path())
+
+    def load_accepted(self) -> bool:
+        """
+        Carga el último modelo aceptado si corresponde al dataset base y la
+        configuración actuales; devuelve False si no hay uno válido
+        """
+        try:
+            with open(self.accepted_path(), encoding="utf-8") as fh:
+                pointer = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if pointer.get("base_key") != self.base_key():
+            return False
+        return self.load_model(pointer["version"])
+
+    def load_or_train(self):
+        """
+        Carga el último modelo aceptado o, si no hay, el modelo de arranque
+        cuando coincide con el dataset base y la configuración actuales; si no,
+        lo entrena (solo con el dataset base) y lo guarda. Los registros nuevos
+        quedan para el reentrenamiento en segundo plano, así que guardarlos no
+        obliga a reentrenar al arrancar, y un candidato rechazado nunca queda en
+        servicio tras reiniciar.
+        """
+        if self.load_accepted() or self.load_model(self.base_key()):
+            return
+        self.train_model(include_new_records=False)
+        self.save_model()
+        self.mark_accepted()
 
     def predict_score(self, aggregated_preferences: Dict[str, float]) -> float:
         """
@@ -70,15 +472,72 @@ class ModelManager:
         score_pred = self.model.predict(X_input)[0]
         return float(score_pred)
 
-    def save_new_record(self, record: Dict[str, Any]):
+    def prediction_buffer(self, n_rows: int) -> np.ndarray:
+        """
+        Buffer float32 contiguo (n_rows x columnas) propio del hilo actual. Se
+        reutiliza entre peticiones y solo crece cuando hace falta más espacio.
+        """
+        buffer = getattr(self._buffers, "array", None)
+        if buffer is None or buffer.shape[0] < n_rows:
+            buffer = np.empty((max(n_rows, 1), len(self.feature_columns)), dtype=np.float32)
+            self._buffers.array = buffer
+        return buffer[:n_rows]
+
+    def predict_matrix(self, X: np.ndarray, model: XGBRegressor | None = None) -> np.ndarray:
+        """
+        Predice sobre una matriz 2D de características. Con 'fast_inference'
+        usa el booster directamente (sin DataFrame ni validación de columnas);
+        con 'verify_inference' compara el resultado con la ruta sklearn.
+        """
+        model = model if model is not None else self.model
+        if model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+        if not self.fast_inference:
+            with self._inference_lock:
+                self.reference_predictions += 1
+            return predict_matrix(model, self.feature_columns, X)
+
+        if X.dtype != np.float32 or not X.flags.c_contiguous:
+            buffer = self.prediction_buffer(X.shape[0])
+            np.copyto(buffer, X, casting="same_kind")
+            X = buffer
+        best_iteration = getattr(model, "best_iteration", None)
+        scores = model.get_booster().inplace_predict(
+            X,
+            iteration_range=(0, best_iteration + 1) if best_iteration is not None else (0, 0),
+            predict_type="value",
+            missing=model.missing,
+            validate_features=False,
+        )
+        with self._inference_lock:
+            self.fast_predictions += 1
+        if self.verify_inference:
+            reference = predict_matrix(model, self.feature_columns, X)
+            identical = reference.dtype == scores.dtype and np.array_equal(reference, scores)
+            with self._inference_lock:
+                self.verified_predictions += 1
+                if not identical:
+                    self.prediction_mismatches += 1
+            if not identical:
+                diff = float(np.max(np.abs(reference.astype(np.float64) - scores.astype(np.float64))))
+                logger.warning(f"Predicción rápida distinta de la ruta sklearn (máx. diferencia {diff}); se usa la de referencia.")
+                return reference
+        return scores
+
+    def inference_stats(self) -> Dict[str, Any]:
+        with self._inference_lock:
+            return {
+                "fast_inference": self.fast_inference,
+                "verify_inference": self.verify_inference,
+                "fast_predictions": self.fast_predictions,
+                "reference_predictions": self.reference_predictions,
+                "verified_predictions": self.verified_predictions,
+                "prediction_mismatches": self.prediction_mismatches,
+            }
+
+    def save_new_record(self, record: Dict[str, Any], idempotency_key: str | None = None) -> bool:
         """
-        Guarda un nuevo registro en el archivo CSV para futuros reentrenamientos
+        Guarda un nuevo registro para futuros reentrenamientos. Se escribe por
+        lotes; devuelve False si el registro ya había sido guardado.
         """
-        all_columns = self.feature_columns + ["provincia","canton","parroquia","nombre","lat","lon","score (promedio preferencias)"]
-        df_record = pd.DataFrame([record], columns=[c for c in all_columns if c in record])
-        
-        if os.path.exists(self.new_data_path):
-            df_record.to_csv(self.new_data_path, mode='a', header=False, index=False)
-        else:
-            df_record.to_csv(self.new_data_path, index=False)
-        print(f"Nuevo registro guardado en {self.new_data_path}")
+        return self.record_log.append(record, idempotency_key)
@@ -0,0 +1,74 @@
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Prefijo común de las columnas de calificación del dataset
+RATING_PREFIX = "calif promedio "
+
+
+def _normalize_key(key: str) -> str:
+    """
+    Normaliza una clave de preferencia: minúsculas, '_' como espacio y sin espacios repetidos
+    """
+    return " ".join(str(key).lower().replace("_", " ").split())
+
+
+class PreferenceResolver:
+    """
+    Traduce claves de preferencias (nombre completo de la columna o alias corto,
+    p. ej. 'playas') a índices de columna, precompilando todos los alias una sola vez
+    """
+
+    def __init__(self, feature_columns: List[str]):
+        self.feature_columns = list(feature_columns)
+        self.n_features = len(self.feature_columns)
+        self._index: Dict[str, int] = {}
+        for i, col in enumerate(self.feature_columns):
+            full = _normalize_key(col)
+            self._index[full] = i
+            if full.startswith(RATING_PREFIX):
+                self._index[full[len(RATING_PREFIX):]] = i
+
+    def resolve(self, key: str) -> Optional[int]:
+        """
+        Devuelve el índice de columna para una clave o None si no corresponde a ninguna
+        """
+        idx = self._index.get(key)
+        if idx is None:
+            idx = self._index.get(_normalize_key(key))
+        return idx
+
+    def member_matrix(self, preference_maps: Iterable[Mapping[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Construye la matriz densa (miembros x columnas) con la suma de valores
+        y la matriz de conteos; conteo > 0 es la máscara de presencia
+        """
+        rows, cols, vals = [], [], []
+        n_members = 0
+        for m, prefs in enumerate(preference_maps):
+            n_members = m + 1
+            for key, value in prefs.items():
+                idx = self.resolve(key)
+                if idx is not None:
+                    rows.append(m)
+                    cols.append(idx)
+                    vals.append(value)
+
+        sums = np.zeros((n_members, self.n_features), dtype=np.float64)
+        counts = np.zeros((n_members, self.n_features), dtype=np.int32)
+        if rows:
+            np.add.at(sums, (rows, cols), vals)
+            np.add.at(counts, (rows, cols), 1)
+        return sums, counts
+
+    def aggregate(self, preference_maps: Iterable[Mapping[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Promedio enmascarado de las preferencias de todos los miembros.
+        Devuelve (vector de medias, máscara de columnas con al menos un valor)
+        """
+        sums, counts = self.member_matrix(preference_maps)
+        total = counts.sum(axis=0)
+        present = total > 0
+        means = np.zeros(self.n_features, dtype=np.float64)
+        np.divide(sums.sum(axis=0), total, out=means, where=present)
+        return means, present
@@ -0,0 +1,209 @@
+"""
+Perfilado bajo demanda de peticiones individuales.
+
+Una petición se perfila solo si trae el encabezado 'X-Profile: 1' (o el
+parámetro '?profile=1') junto con un token de administrador válido en
+'X-Admin-Token'. El perfil (cProfile) se guarda como archivo .prof de pstats,
+compatible con snakeviz, flameprof o gprof2dot. Sin la marca, el costo es
+leer un encabezado.
+"""
+import logging
+import io
+import os
+import re
+import hmac
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY = "profile"
+TOKEN_HEADER = "x-admin-token"
+_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{6}_[a-z_]+_[0-9a-f]{8}$")
+
+
+class ProfilingDenied(Exception):
+    """
+    La petición pidió perfilado sin un token válido o sobrepasó el límite de frecuencia
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _NullSession:
+    """
+    Sesión vacía cuando la petición no se perfila: no hace nada
+    """
+
+    profile_id = None
+
+    def section(self):
+        return nullcontext()
+
+    def wrap(self, fn: Callable) -> Callable:
+        return fn
+
+    def save(self) -> None:
+        return None
+
+
+NULL_SESSION = _NullSession()
+
+
+class ProfileSession:
+    """
+    Perfil de una petición. Las secciones síncronas en el hilo del event loop
+    y el trabajo enviado al pool de inferencia se perfilan por separado y se
+    combinan en un solo archivo al guardar.
+    """
+
+    def __init__(self, profiler: "RequestProfiler", operation: str):
+        self.profiler = profiler
+        self.operation = operation
+        self.profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}_{operation}_{uuid.uuid4().hex[:8]}"
+        self.started = time.perf_counter()
+        self._profiles: List[cProfile.Profile] = []
+
+    @contextmanager
+    def section(self):
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def wrap(self, fn: Callable) -> Callable:
+        def profiled(*args: Any, **kwargs: Any):
+            with self.section():
+                return fn(*args, **kwargs)
+        return profiled
+
+    def save(self) -> Optional[str]:
+        profiles = [p for p in self._profiles if p.getstats()]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return self.profiler.store(self.profile_id, stats, time.perf_counter() - self.started)
+
+
+class RequestProfiler:
+    """
+    Autoriza, limita y guarda los perfiles de peticiones marcadas
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        admin_tokens: List[str],
+        min_interval_seconds: float = 10.0,
+        max_files: int = 50,
+    ):
+        self.directory = os.path.abspath(directory)
+        self.admin_tokens = [t for t in admin_tokens if t]
+        self.min_interval_seconds = min_interval_seconds
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._last_started = float("-inf")
+        self.profiles_taken = 0
+        self.rejected = 0
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        if not token:
+            return False
+        return any(hmac.compare_digest(token, t) for t in self.admin_tokens)
+
+    @staticmethod
+    def requested(headers: Dict[str, str], query: Dict[str, str]) -> bool:
+        flag = headers.get(PROFILE_HEADER) or query.get(PROFILE_QUERY)
+        return flag is not None and flag.lower() in ("1", "true", "yes")
+
+    def session(self, request, operation: str):
+        """
+        Devuelve una sesión de perfilado si la petición la pide y está
+        autorizada; NULL_SESSION si no la pide. Lanza ProfilingDenied si la
+        pide sin token válido o antes de que pase el intervalo mínimo.
+        """
+        if not self.requested(request.headers, request.query_params):
+            return NULL_SESSION
+        if not self.is_admin(request.headers.get(TOKEN_HEADER)):
+            with self._lock:
+                self.rejected += 1
+            raise ProfilingDenied(403, "El perfilado requiere un token de administrador válido.")
+        now = time.monotonic()
+        with self._lock:
+            wait = self._last_started + self.min_interval_seconds - now
+            if wait > 0:
+                self.rejected += 1
+                raise ProfilingDenied(429, "Límite de perfilado alcanzado, intenta más tarde.", retry_after=int(wait) + 1)
+            self._last_started = now
+            self.profiles_taken += 1
+        return ProfileSession(self, operation)
+
+    def store(self, profile_id: str, stats: pstats.Stats, elapsed: float) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(profile_id)
+        tmp_path = f"{path}.tmp"
+        stats.dump_stats(tmp_path)
+        os.replace(tmp_path, path)
+        self._rotate()
+        logger.info(f"Perfil {profile_id} guardado ({elapsed * 1000:.1f} ms).")
+        return path
+
+    def _rotate(self):
+        # Conservar solo los 'max_files' perfiles más recientes
+        profiles = sorted(self.list_profiles(), key=lambda p: p["created_at"])
+        for profile in profiles[:max(0, len(profiles) - self.max_files)]:
+            try:
+                os.remove(self.path(profile["id"]))
+            except OSError:
+                pass
+
+    def path(self, profile_id: str) -> str:
+        if not _ID_PATTERN.match(profile_id):
+            raise ValueError(f"Identificador de perfil inválido: {profile_id}")
+        return os.path.join(self.directory, f"{profile_id}.prof")
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            profile_id, ext = os.path.splitext(name)
+            if ext != ".prof" or not _ID_PATTERN.match(profile_id):
+                continue
+            st = os.stat(os.path.join(self.directory, name))
+            profiles.append({"id": profile_id, "size": st.st_size, "created_at": st.st_mtime})
+        return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+    def summary(self, profile_id: str, limit: int = 40, sort: str = "cumulative") -> str:
+        """
+        Resumen en texto de pstats (funciones ordenadas por 'sort')
+        """
+        out = io.StringIO()
+        stats = pstats.Stats(self.path(profile_id), stream=out)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": bool(self.admin_tokens),
+                "min_interval_seconds": self.min_interval_seconds,
+                "profiles_taken": self.profiles_taken,
+                "rejected": self.rejected,
+                "stored": len(self.list_profiles()),
+            }
@@ -0,0 +1,90 @@
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Columnas que se devuelven en cada recomendación
+RESULT_COLUMNS = ["nombre", "provincia", "canton"]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Índices de los k mayores scores en orden descendente usando selección parcial
+    (O(n) + O(k log k)) en lugar de ordenar todo el arreglo
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    # Orden final solo sobre los k candidatos; empates se resuelven por posición
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def _json_value(value):
+    # NaN no es JSON válido: los valores faltantes se devuelven como null
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+class Recommendation:
+    """
+    Resultado del top-k con atributos fijos (sin diccionario por instancia)
+    """
+
+    __slots__ = ("nombre", "provincia", "canton", "predicted_score", "extras")
+
+    def __init__(self, nombre, provincia, canton, predicted_score: float, extras: Optional[Dict[str, float]] = None):
+        self.nombre = nombre
+        self.provincia = provincia
+        self.canton = canton
+        self.predicted_score = predicted_score
+        self.extras = extras
+
+    def to_dict(self) -> Dict:
+        item = {
+            "nombre": self.nombre,
+            "provincia": self.provincia,
+            "canton": self.canton,
+            "predicted_score": self.predicted_score,
+        }
+        if self.extras:
+            item.update(self.extras)
+        return item
+
+
+def build_recommendations(
+    metadata: Mapping[str, Sequence],
+    scores: np.ndarray,
+    indices: np.ndarray,
+    rows: Optional[np.ndarray] = None,
+    extras: Optional[Dict[str, np.ndarray]] = None,
+) -> List[Recommendation]:
+    """
+    Materializa solo las filas seleccionadas como registros Recommendation.
+    Si los scores corresponden a un subconjunto del catálogo, 'rows' da la
+    fila del catálogo de cada score; 'extras' son columnas alineadas con los
+    scores (p. ej. distancias) que se agregan a cada resultado.
+    """
+    nombre, provincia, canton = (metadata[col] for col in RESULT_COLUMNS)
+    recommendations = []
+    for i in indices:
+        row = rows[i] if rows is not None else i
+        recommendations.append(Recommendation(
+            _json_value(nombre[row]),
+            _json_value(provincia[row]),
+            _json_value(canton[row]),
+            float(scores[i]),
+            {name: float(values[i]) for name, values in extras.items()} if extras else None,
+        ))
+    return recommendations
+
+
+def recommendations_to_dicts(recommendations: Sequence[Recommendation]) -> List[Dict]:
+    """
+    Convierte los registros a diccionarios para la respuesta JSON
+    """
+    return [r.to_dict() for r in recommendations]
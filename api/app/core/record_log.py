@@ -0,0 +1,249 @@
+import logging
+import io
+import os
+import csv
+import time
+import atexit
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+
+class RecordLog:
+    """
+    Registro de solo-anexado para los viajes guardados desde la API.
+    Acumula registros en memoria y los escribe por lotes (por tamaño o
+    intervalo) bajo un bloqueo de archivo compartido entre procesos.
+    Solo los registros con clave de idempotencia explícita se deduplican, y
+    sus claves caducan a las 'key_ttl' segundos.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        columns: List[str],
+        flush_size: int = 100,
+        flush_interval: float = 1.0,
+        fsync: bool = True,
+        key_ttl: float = 24 * 3600,
+    ):
+        self.path = os.path.abspath(path)
+        self.lock_path = f"{self.path}.lock"
+        self.keys_path = f"{self.path}.keys"
+        self.columns = list(columns)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.key_ttl = key_ttl
+        self._buffer: List[Tuple[Optional[str], Dict[str, Any]]] = []
+        self._pending_keys: Set[str] = set()
+        # Clave de idempotencia -> instante en que se escribió
+        self._seen_keys: Dict[str, float] = {}
+        self._keys_offset = 0
+        self._keys_inode: Optional[int] = None
+        # Líneas del archivo de claves (vigentes o no) desde la última compactación
+        self._keys_lines = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.duplicates = 0
+
+    def _is_seen(self, key: str, now: float) -> bool:
+        written_at = self._seen_keys.get(key)
+        return written_at is not None and now - written_at < self.key_ttl
+
+    def append(self, record: Dict[str, Any], idempotency_key: Optional[str] = None) -> bool:
+        """
+        Agrega un registro al buffer. Devuelve False si su clave de idempotencia
+        ya se usó dentro de 'key_ttl'. Sin clave, dos envíos iguales son dos registros.
+        """
+        key = idempotency_key or None
+        with self._lock:
+            if key is not None:
+                if key in self._pending_keys or self._is_seen(key, time.time()):
+                    self.duplicates += 1
+                    return False
+                self._pending_keys.add(key)
+            self._buffer.append((key, record))
+            should_flush = len(self._buffer) >= self.flush_size
+        if should_flush:
+            self.flush()
+        return True
+
+    def _read_new_keys(self):
+        """
+        Incorpora las claves que otros procesos escribieron desde la última
+        lectura (todo el archivo si otro proceso lo compactó). Cada línea es
+        'clave<TAB>instante'.
+        """
+        try:
+            inode = os.stat(self.keys_path).st_ino
+        except FileNotFoundError:
+            return
+        if inode != self._keys_inode:
+            self._keys_inode, self._keys_offset, self._keys_lines = inode, 0, 0
+        with open(self.keys_path, "rb") as fh:
+            fh.seek(self._keys_offset)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    # Línea incompleta: se vuelve a leer en la siguiente pasada
+                    break
+                self._keys_offset += len(line)
+                self._keys_lines += 1
+                key, _, written_at = line.decode("utf-8").rstrip("\n").partition("\t")
+                try:
+                    written_at = float(written_at)
+                except ValueError:
+                    # Formato anterior (solo la clave): vence key_ttl después de leerla
+                    written_at = time.time()
+                self._seen_keys[key] = max(written_at, self._seen_keys.get(key, written_at))
+
+    def _expire_keys(self):
+        """
+        Olvida las claves vencidas y, si ocupan la mayor parte del archivo de
+        claves, lo reescribe solo con las vigentes (reemplazo atómico). Se
+        llama con el bloqueo de archivo tomado.
+        """
+        now = time.time()
+        self._seen_keys = {key: t for key, t in self._seen_keys.items() if now - t < self.key_ttl}
+        if self._keys_lines < 1000 or self._keys_lines < 2 * len(self._seen_keys):
+            return
+        tmp_path = f"{self.keys_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write("".join(f"{key}\t{t}\n" for key, t in self._seen_keys.items()).encode("utf-8"))
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+            offset = fh.tell()
+        os.replace(tmp_path, self.keys_path)
+        self._keys_inode = os.stat(self.keys_path).st_ino
+        self._keys_offset, self._keys_lines = offset, len(self._seen_keys)
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as fh:
+            fh.seek(-1, os.SEEK_END)
+            return fh.read(1) == b"\n"
+
+    def _file_columns(self) -> Optional[List[str]]:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return None
+        with open(self.path, "r", encoding="utf-8", newline="") as fh:
+            return next(csv.reader(fh), None)
+
+    def _write_batch(
+        self, batch: List[Tuple[Optional[str], Dict[str, Any]]]
+    ) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.lock_path, "a") as lock_fh:
+            if fcntl is not None:
+                fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            try:
+                self._read_new_keys()
+                self._expire_keys()
+                now = time.time()
+                rows, batch_keys = [], set()
+                for key, record in batch:
+                    if key is not None:
+                        if self._is_seen(key, now) or key in batch_keys:
+                            self.duplicates += 1
+                            continue
+                        batch_keys.add(key)
+                    rows.append((key, record))
+                if not rows:
+                    return rows
+
+                # Respetar el encabezado existente del archivo
+                columns = self._file_columns()
+                buf = io.StringIO()
+                writer = csv.writer(buf, lineterminator="\n")
+                if columns is None:
+                    columns = self.columns
+                    writer.writerow(columns)
+                elif not self._ends_with_newline():
+                    buf.write("\n")
+                for _, record in rows:
+                    writer.writerow(["" if record.get(c) is None else record.get(c) for c in columns])
+
+                with open(self.path, "a", encoding="utf-8", newline="") as fh:
+                    fh.write(buf.getvalue())
+                    fh.flush()
+                    if self.fsync:
+                        os.fsync(fh.fileno())
+                if batch_keys:
+                    with open(self.keys_path, "ab") as fh:
+                        fh.write("".join(f"{key}\t{now}\n" for key in batch_keys).encode("utf-8"))
+                        fh.flush()
+                        if self.fsync:
+                            os.fsync(fh.fileno())
+                        self._keys_offset = fh.tell()
+                    self._keys_inode = os.stat(self.keys_path).st_ino
+                    self._keys_lines += len(batch_keys)
+                    self._seen_keys.update(dict.fromkeys(batch_keys, now))
+                return rows
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_fh, fcntl.LOCK_UN)
+
+    def flush(self) -> int:
+        """
+        Escribe el buffer en disco bajo bloqueo exclusivo; devuelve las filas escritas
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            try:
+                rows = self._write_batch(batch)
+            except Exception:
+                # Devolver el lote al buffer para reintentarlo en el siguiente vaciado
+                with self._lock:
+                    self._buffer = batch + self._buffer
+                raise
+
+            with self._lock:
+                for key, _ in batch:
+                    if key is not None:
+                        self._pending_keys.discard(key)
+            self.written += len(rows)
+            return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error al escribir registros nuevos: {e}")
+
+    def start(self):
+        """
+        Inicia el hilo que vacía el buffer periódicamente
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="record-log-flusher", daemon=True)
+        self._thread.start()
+        # No perder lo que quede en el buffer al terminar el proceso
+        atexit.register(self.close)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {"buffered": buffered, "written": self.written, "duplicates": self.duplicates}
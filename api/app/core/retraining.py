@@ -0,0 +1,299 @@
+import os
+import logging
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from xgboost import XGBRegressor
+
+from .logs import configure_logging
+from .metrics import STAGE_SECONDS, stage_timer
+from .model_manager import ModelManager
+
+logger = logging.getLogger(__name__)
+
+def _rmse(model: XGBRegressor, X, y) -> float:
+    pred = model.predict(X)
+    return float(np.sqrt(np.mean((pred - y) ** 2)))
+
+
+def _current_validation_model(
+    manager: ModelManager, current_version: Optional[str], n_jobs: Optional[int]
+) -> Optional[XGBRegressor]:
+    """
+    Gemelo de validación del modelo en servicio. El del modelo de arranque se
+    entrena aquí la primera vez (solo dataset base, sin las filas reservadas).
+    """
+    if not current_version:
+        return None
+    model = manager.load_validation_model(current_version)
+    if model is None and current_version == manager.base_key():
+        manager.train_model(n_jobs=n_jobs, include_new_records=False, exclude_holdout=True)
+        manager.save_validation_model(manager.model, current_version)
+        model = manager.model
+    return model
+
+
+def train_candidate(
+    data_path: str,
+    new_data_path: str,
+    model_dir: str,
+    current_version: Optional[str],
+    tolerance: float,
+    n_jobs: Optional[int],
+    incremental: bool = False,
+    max_new_trees: int = 50,
+    full_rebuild_every: int = 10,
+) -> Dict[str, Any]:
+    """
+    Se ejecuta en un proceso aparte: entrena un modelo candidato (completo o
+    incremental sobre el modelo en servicio), lo compara con el modelo en
+    servicio y solo guarda el artefacto (y lo marca como aceptado) si pasa la validación.
+
+    La comparación usa gemelos de validación: el candidato y el modelo en
+    servicio con la misma receta pero sin las filas reservadas, así que ninguno
+    vio los datos con que se los evalúa. Si el candidato se acepta, se vuelve a
+    entrenar con todos los datos (lo que se sirve) y su gemelo se guarda junto
+    al artefacto para la siguiente comparación. Cuesta un segundo ajuste por
+    candidato aceptado, fuera del proceso servidor.
+    """
+    # Proceso nuevo ('spawn'): sin configurar, el logging solo mostraría advertencias
+    configure_logging()
+    # 'candidate' entrena el gemelo de validación; 'manager', el modelo que se sirve
+    candidate = ModelManager(data_path, new_data_path, model_dir=model_dir)
+    manager = ModelManager(data_path, new_data_path, model_dir=model_dir)
+    current_validation = _current_validation_model(candidate, current_version, n_jobs)
+
+    if incremental and current_validation is not None and manager.load_model(current_version):
+        candidate.swap_model(
+            current_validation, current_version, manager.trained_new_records,
+            manager.incremental_updates, data_key=manager.data_key,
+        )
+        if not candidate.update_incremental(
+            max_new_trees=max_new_trees, full_rebuild_every=full_rebuild_every, n_jobs=n_jobs, exclude_holdout=True
+        ):
+            # No hay registros nuevos para entrenar: el modelo en servicio sigue vigente
+            return {"version": current_version, "data_key": manager.data_key, "path": None, "accepted": False,
+                    "rmse_candidate": None, "rmse_current": None,
+                    "trained_new_records": manager.trained_new_records,
+                    "incremental_updates": manager.incremental_updates,
+                    "timings": candidate.train_timings}
+
+        def refit():
+            manager.update_incremental(max_new_trees=max_new_trees, full_rebuild_every=full_rebuild_every, n_jobs=n_jobs)
+    else:
+        candidate.train_model(n_jobs=n_jobs, exclude_holdout=True)
+
+        def refit():
+            manager.train_model(n_jobs=n_jobs)
+
+    timer = stage_timer("retrain")
+    # Conjunto de validación reservado: ninguno de los dos modelos comparados entrenó con él
+    X_val, y_val = candidate.validation_data()
+    rmse_candidate = _rmse(candidate.model, X_val, y_val)
+
+    rmse_current = None
+    current = current_validation
+    if current is None and current_version and os.path.exists(manager.artifact_path(current_version)):
+        # Sin gemelo (artefacto anterior a los gemelos): se compara con el modelo
+        # en servicio, que sí pudo ver las filas reservadas (comparación conservadora)
+        current = XGBRegressor()
+        current.load_model(manager.artifact_path(current_version))
+    if current is not None:
+        rmse_current = _rmse(current, X_val, y_val)
+
+    accepted = bool(np.isfinite(rmse_candidate)) and (
+        rmse_current is None or rmse_candidate <= rmse_current * (1 + tolerance)
+    )
+    timings = candidate.train_timings + [("retrain", "validate", timer.mark("validate"))]
+    if not accepted:
+        return {
+            "version": candidate.model_version,
+            "data_key": candidate.data_key,
+            "path": None,
+            "accepted": False,
+            "rmse_candidate": rmse_candidate,
+            "rmse_current": rmse_current,
+            "trained_new_records": candidate.trained_new_records,
+            "incremental_updates": candidate.incremental_updates,
+            "timings": timings,
+        }
+
+    refit()
+    timings += manager.train_timings + [("retrain", "refit", timer.mark("refit"))]
+    path = manager.save_model()
+    manager.save_validation_model(candidate.model)
+    # Al reiniciar se vuelve a cargar este modelo (ver ModelManager.load_or_train)
+    manager.mark_accepted()
+    timings.append(("retrain", "save", timer.mark("save")))
+    return {
+        "version": manager.model_version,
+        "data_key": manager.data_key,
+        "path": path,
+        "accepted": True,
+        "rmse_candidate": rmse_candidate,
+        "rmse_current": rmse_current,
+        "trained_new_records": manager.trained_new_records,
+        "incremental_updates": manager.incremental_updates,
+        "timings": timings,
+    }
+
+
+class RetrainingWorker:
+    """
+    Reentrena el modelo en un proceso separado cada cierto tiempo o cuando
+    llegan suficientes registros nuevos, y cambia el modelo en servicio
+    de forma atómica si el candidato pasa la validación
+    """
+
+    def __init__(
+        self,
+        manager: ModelManager,
+        interval_seconds: float = 0,
+        min_new_records: int = 0,
+        tolerance: float = 0.05,
+        n_jobs: Optional[int] = None,
+        poll_seconds: float = 10.0,
+        incremental: bool = False,
+        max_new_trees: int = 50,
+        full_rebuild_every: int = 10,
+    ):
+        self.manager = manager
+        self.interval_seconds = interval_seconds
+        self.min_new_records = min_new_records
+        self.tolerance = tolerance
+        self.n_jobs = n_jobs
+        self.poll_seconds = poll_seconds
+        self.incremental = incremental
+        self.max_new_trees = max_new_trees
+        self.full_rebuild_every = full_rebuild_every
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._on_swap: List[Callable[[str], None]] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._future: Optional[Future] = None
+        self._last_run = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_seconds > 0 or self.min_new_records > 0
+
+    @property
+    def running(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def add_swap_listener(self, callback: Callable[[str], None]):
+        """
+        Registra una función que se llama con la nueva versión tras cada cambio de modelo
+        """
+        self._on_swap.append(callback)
+
+    def _should_retrain(self) -> bool:
+        last = self.last_result
+        if last is not None and not last["accepted"] and last.get("data_key") == self.manager.artifact_key():
+            # El candidato para estos mismos datos ya fue rechazado
+            return False
+        if self.interval_seconds > 0 and time.monotonic() - self._last_run >= self.interval_seconds:
+            # Solo si los datos cambiaron desde el modelo en servicio
+            if self.manager.artifact_key() != self.manager.data_key:
+                return True
+            self._last_run = time.monotonic()
+        if self.min_new_records > 0:
+            pending = self.manager.count_new_records() - self.manager.trained_new_records
+            if pending >= self.min_new_records:
+                return True
+        return False
+
+    def trigger(self) -> bool:
+        """
+        Lanza un reentrenamiento si no hay uno en curso
+        """
+        with self._lock:
+            if self.running:
+                return False
+            if self._executor is None:
+                # 'spawn' evita heredar hilos/locks del proceso servidor
+                self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            self._last_run = time.monotonic()
+            self._future = self._executor.submit(
+                train_candidate,
+                self.manager.data_path,
+                self.manager.new_data_path,
+                self.manager.model_dir,
+                self.manager.model_version,
+                self.tolerance,
+                self.n_jobs,
+                self.incremental,
+                self.max_new_trees,
+                self.full_rebuild_every,
+            )
+            self._future.add_done_callback(self._on_done)
+            return True
+
+    def _on_done(self, future: Future):
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            # El proceso de entrenamiento murió: se crea uno nuevo en el siguiente intento
+            logger.error(f"Error en el reentrenamiento: {e}")
+            with self._lock:
+                self._executor = None
+            return
+        except Exception as e:
+            logger.error(f"Error en el reentrenamiento: {e}")
+            return
+        self.last_result = result
+        # Las métricas del proceso de entrenamiento se registran en este proceso
+        for operation, stage, seconds in result.get("timings", []):
+            STAGE_SECONDS.observe(seconds, operation=operation, stage=stage)
+        if not result["accepted"]:
+            logger.info(
+                f"Modelo candidato {result['version']} rechazado "
+                f"(RMSE {result['rmse_candidate']} vs {result['rmse_current']})."
+            )
+            return
+        if result["version"] == self.manager.model_version:
+            return
+        model = XGBRegressor()
+        model.load_model(result["path"])
+        self.manager.swap_model(
+            model,
+            result["version"],
+            result["trained_new_records"],
+            result["incremental_updates"],
+            data_key=result.get("data_key"),
+        )
+        logger.info(f"Modelo en servicio actualizado a la versión {result['version']}.")
+        for callback in self._on_swap:
+            callback(result["version"])
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                if not self.running and self._should_retrain():
+                    self.trigger()
+            except Exception as e:
+                logger.error(f"Error al programar el reentrenamiento: {e}")
+
+    def start(self):
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._last_run = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, name="retraining-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
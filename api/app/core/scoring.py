@@ -0,0 +1,81 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Límite de filas (familias x destinos) por cada llamada al modelo
+DEFAULT_MAX_ROWS_PER_CHUNK = 250_000
+
+
+def build_prediction_matrix(
+    features: np.ndarray, aggregated: np.ndarray, present: np.ndarray, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Matriz de predicción de una familia: las columnas con preferencia
+    se reemplazan por el valor agregado en todos los destinos.
+    Si se pasa 'out', se escribe en ese buffer en lugar de copiar.
+    """
+    if out is None:
+        X = features.copy()
+    else:
+        X = out
+        np.copyto(X, features, casting="same_kind")
+    X[:, present] = aggregated[present]
+    return X
+
+
+def build_stacked_matrix(
+    features: np.ndarray, aggregated: np.ndarray, present: np.ndarray, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Matriz apilada (familias x destinos x columnas) a partir de las medias
+    (familias x columnas) y sus máscaras de presencia
+    """
+    if out is None:
+        return np.where(present[:, None, :], aggregated[:, None, :], features[None, :, :])
+    np.copyto(out, features[None, :, :], casting="same_kind")
+    np.copyto(out, aggregated[:, None, :], casting="same_kind", where=present[:, None, :])
+    return out
+
+
+def predict_matrix(model, feature_columns: List[str], X: np.ndarray) -> np.ndarray:
+    """
+    Ejecuta el modelo sobre una matriz 2D de características mediante el
+    wrapper sklearn y un DataFrame (ruta de referencia de la inferencia rápida)
+    """
+    return model.predict(pd.DataFrame(X, columns=feature_columns))
+
+
+def score_families(
+    manager,
+    model,
+    features: np.ndarray,
+    aggregated: Sequence[np.ndarray],
+    present: Sequence[np.ndarray],
+    max_rows_per_chunk: int = DEFAULT_MAX_ROWS_PER_CHUNK,
+) -> List[np.ndarray]:
+    """
+    Predice los scores de varias familias sobre todo el catálogo con una
+    llamada al modelo por bloque. Devuelve un arreglo de scores por familia.
+    'manager' aporta el buffer reutilizable y la ruta de predicción (ModelManager).
+    """
+    n_families = len(aggregated)
+    n_destinations, n_features = features.shape
+    if n_families == 0:
+        return []
+    if n_destinations == 0:
+        return [np.empty(0, dtype=np.float32) for _ in range(n_families)]
+
+    aggregated = np.asarray(aggregated, dtype=features.dtype).reshape(n_families, n_features)
+    present = np.asarray(present, dtype=bool).reshape(n_families, n_features)
+    families_per_chunk = max(1, max_rows_per_chunk // n_destinations)
+
+    results: List[np.ndarray] = []
+    for start in range(0, n_families, families_per_chunk):
+        stop = min(start + families_per_chunk, n_families)
+        rows = (stop - start) * n_destinations
+        out = manager.prediction_buffer(rows).reshape(stop - start, n_destinations, n_features)
+        stacked = build_stacked_matrix(features, aggregated[start:stop], present[start:stop], out=out)
+        scores = manager.predict_matrix(stacked.reshape(rows, n_features), model)
+        results.extend(scores.reshape(stop - start, n_destinations))
+    return results
@@ -0,0 +1,185 @@
+import os
+import logging
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+from .model_manager import ModelManager
+from .storage import ensure_columnar
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = "current.json"
+
+
+class SharedArtifacts:
+    """
+    Modo de artefactos compartidos entre workers de uvicorn.
+    Un solo proceso entrena el modelo y convierte el catálogo a formato
+    columnar; la versión vigente se publica en un archivo puntero
+    ('current.json') que todos los workers vigilan.
+
+    Lo que se comparte en memoria es solo la matriz del catálogo (memory-map
+    de solo lectura, una copia en el page cache para todos). El modelo se
+    comparte en disco: cada worker carga el artefacto publicado en su propio
+    booster, así que la memoria del modelo crece con el número de workers.
+    """
+
+    def __init__(self, manager: ModelManager, poll_interval: float = 5.0):
+        self.manager = manager
+        self.model_dir = manager.model_dir
+        self.pointer_path = os.path.join(self.model_dir, POINTER_FILE)
+        self.build_lock_path = os.path.join(self.model_dir, "build.lock")
+        self.leader_lock_path = os.path.join(self.model_dir, "leader.lock")
+        self.poll_interval = poll_interval
+        self.is_leader = False
+        self._leader_fh = None
+        self._on_leader: List[Callable[[], None]] = []
+        self._on_swap: List[Callable[[str], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def _exclusive(self, path: str):
+        os.makedirs(self.model_dir, exist_ok=True)
+        with open(path, "a") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def build_lock(self):
+        """
+        Bloqueo exclusivo entre procesos para construir/convertir artefactos
+        """
+        return self._exclusive(self.build_lock_path)
+
+    def read_pointer(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.pointer_path, encoding="utf-8") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def publish(self, version: Optional[str] = None):
+        """
+        Publica la versión del modelo en servicio en el archivo puntero (reemplazo atómico)
+        """
+        version = version or self.manager.model_version
+        pointer = {
+            "model_version": version,
+            "model_path": self.manager.artifact_path(version),
+            # Dataset base del modelo publicado: si cambia, el puntero deja de valer
+            "base_key": self.manager.base_key(),
+            "published_at": time.time(),
+            "publisher_pid": os.getpid(),
+        }
+        os.makedirs(self.model_dir, exist_ok=True)
+        tmp_path = f"{self.pointer_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(pointer, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self.pointer_path)
+
+    def build_or_load(self, catalog_paths: List[str]):
+        """
+        Bajo un bloqueo de construcción: el primer worker entrena o carga el
+        modelo, convierte el catálogo y publica el puntero; los demás esperan
+        el bloqueo y cargan lo publicado (sin reentrenar, pero cada uno
+        deserializa su propia copia del modelo)
+        """
+        with self.build_lock():
+            for path in catalog_paths:
+                ensure_columnar(path, self.manager.feature_columns)
+            pointer = self.read_pointer()
+            if (
+                pointer
+                and pointer.get("base_key") == self.manager.base_key()
+                and self.manager.load_model(pointer["model_version"])
+            ):
+                return
+            # No hay publicación o corresponde a otro dataset base: este worker construye y publica
+            self.manager.load_or_train()
+            self.publish()
+
+    def try_become_leader(self) -> bool:
+        """
+        Intenta tomar el rol de líder (retiene un bloqueo de archivo mientras vive el proceso)
+        """
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            self.is_leader = True
+        else:
+            os.makedirs(self.model_dir, exist_ok=True)
+            fh = open(self.leader_lock_path, "a")
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                fh.close()
+                return False
+            self._leader_fh = fh
+            self.is_leader = True
+        logger.info("Este proceso es el líder de artefactos compartidos.")
+        for callback in self._on_leader:
+            callback()
+        return True
+
+    def add_leader_listener(self, callback: Callable[[], None]):
+        """
+        Registra una función que se llama cuando este proceso pasa a ser líder
+        """
+        self._on_leader.append(callback)
+
+    def add_swap_listener(self, callback: Callable[[str], None]):
+        """
+        Registra una función que se llama tras cargar una versión publicada por otro proceso
+        """
+        self._on_swap.append(callback)
+
+    def sync(self) -> bool:
+        """
+        Carga la versión publicada si es distinta de la que está en servicio
+        """
+        pointer = self.read_pointer()
+        if not pointer or pointer["model_version"] == self.manager.model_version:
+            return False
+        if not self.manager.load_model(pointer["model_version"]):
+            return False
+        for callback in self._on_swap:
+            callback(pointer["model_version"])
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.sync()
+                if not self.is_leader:
+                    # Si el líder terminó, otro worker toma su lugar
+                    self.try_become_leader()
+            except Exception as e:
+                logger.error(f"Error al sincronizar artefactos compartidos: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="shared-artifacts", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval)
+            self._thread = None
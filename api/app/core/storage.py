@@ -0,0 +1,255 @@
+"""
+Almacenamiento columnar binario para los datasets de entrenamiento y catálogo.
+
+Cada tabla se guarda en una carpeta '<archivo>.columnar/' con:
+  - features.npy: bloque float32 contiguo con las columnas de calificación
+  - <columna>.npy: columnas numéricas restantes (lat, lon, score, ...)
+  - <columna>.codes.npy: códigos de columnas de texto (-1 = vacío), int8/int16/int32
+    según el tamaño del diccionario
+  - meta.json: esquema, diccionarios de texto y firma del CSV de origen
+
+Los .npy se abren con memory-map, así que cargar la tabla no copia los datos.
+Este módulo solo depende de numpy/pandas para poder usarse desde los scripts ETL.
+"""
+import os
+import logging
+import sys
+import json
+import shutil
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 2: las calificaciones vacías se guardan como NaN (antes 0)
+# 3: los códigos de texto usan el entero más chico que alcanza (antes siempre int32)
+FORMAT_VERSION = 3
+META_FILE = "meta.json"
+FEATURES_FILE = "features.npy"
+
+
+def columnar_dir(csv_path: str) -> str:
+    """
+    Carpeta columnar asociada a un CSV: 'datos.csv' -> 'datos.columnar'
+    """
+    base, _ = os.path.splitext(os.path.abspath(csv_path))
+    return f"{base}.columnar"
+
+
+def file_signature(path: str, with_hash: bool = True) -> Dict[str, Any]:
+    st = os.stat(path)
+    signature = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_hash:
+        sha = hashlib.sha1()
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                sha.update(chunk)
+        signature["sha1"] = sha.hexdigest()
+    return signature
+
+
+def _write_npy(directory: str, name: str, values: np.ndarray) -> str:
+    np.save(os.path.join(directory, name), values, allow_pickle=False)
+    return name
+
+
+def save_columnar(
+    df: pd.DataFrame,
+    directory: str,
+    feature_columns: List[str],
+    source: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Escribe un DataFrame en formato columnar. Se escribe en una carpeta
+    temporal y se renombra al final para que los lectores nunca vean datos a medias.
+    """
+    directory = os.path.abspath(directory)
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Las columnas ausentes quedan en 0 (como en ModelManager._load_data); los
+    # valores vacíos se conservan como NaN, igual que al leer el CSV con pandas
+    features = np.zeros((len(df), len(feature_columns)), dtype=np.float32)
+    for i, col in enumerate(feature_columns):
+        if col in df.columns:
+            features[:, i] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float32)
+    _write_npy(tmp_dir, FEATURES_FILE, np.ascontiguousarray(features))
+
+    columns: Dict[str, Dict[str, Any]] = {}
+    for i, col in enumerate(c for c in df.columns if c not in feature_columns):
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            name = _write_npy(tmp_dir, f"col{i}.npy", series.to_numpy(dtype=np.float64))
+            columns[col] = {"kind": "numeric", "file": name}
+        else:
+            codes, categories = pd.factorize(series.astype(object).where(series.notna(), None), use_na_sentinel=True)
+            name = _write_npy(tmp_dir, f"col{i}.codes.npy", codes.astype(code_dtype(len(categories))))
+            columns[col] = {"kind": "categorical", "file": name, "categories": [str(c) for c in categories]}
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "rows": int(len(df)),
+        "feature_columns": list(feature_columns),
+        "column_order": [str(c) for c in df.columns],
+        "columns": columns,
+        "source": source or {},
+    }
+    with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, ensure_ascii=False)
+
+    # Reemplazo de la carpeta: la anterior se aparta y se borra después
+    old_dir = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return directory
+
+
+def read_meta(directory: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as fh:
+        meta = json.load(fh)
+    if meta.get("format_version") != FORMAT_VERSION:
+        return None
+    return meta
+
+
+def load_columnar(directory: str, mmap: bool = True) -> Tuple[np.ndarray, Dict[str, Any], Dict[str, Any]]:
+    """
+    Abre una tabla columnar. Devuelve (features float32, columnas, meta), donde
+    las columnas numéricas son arreglos y las de texto son (códigos, categorías).
+    """
+    meta = read_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f"Almacenamiento columnar no encontrado o inválido: {directory}")
+    mmap_mode = "r" if mmap else None
+    features = np.load(os.path.join(directory, FEATURES_FILE), mmap_mode=mmap_mode, allow_pickle=False)
+    columns: Dict[str, Any] = {}
+    for col, info in meta["columns"].items():
+        values = np.load(os.path.join(directory, info["file"]), mmap_mode=mmap_mode, allow_pickle=False)
+        if info["kind"] == "categorical":
+            columns[col] = (values, info["categories"])
+        else:
+            columns[col] = values
+    return features, columns, meta
+
+
+def code_dtype(n_categories: int) -> np.dtype:
+    """
+    Entero con signo más chico que guarda los códigos 0..n-1 y el -1 de vacío
+    """
+    for dtype in (np.int8, np.int16):
+        if n_categories <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int32)
+
+
+def decode_categorical(codes: np.ndarray, categories: List[str]) -> np.ndarray:
+    """
+    Reconstruye un arreglo de textos (object) a partir de códigos; -1 -> NaN
+    """
+    # El NaN va al final del diccionario: el código -1 lo toma directamente
+    lookup = np.array(list(categories) + [np.nan], dtype=object)
+    return lookup[codes]
+
+
+class CategoricalColumn:
+    """
+    Columna de texto compacta: un código entero por fila y un diccionario de
+    valores únicos compartido por todas las filas. El diccionario se guarda
+    como un solo bloque UTF-8 con desplazamientos, sin un objeto str por
+    valor; solo se decodifican las filas que se leen.
+    """
+
+    __slots__ = ("codes", "blob", "offsets")
+
+    def __init__(self, codes: np.ndarray, categories: List[str]):
+        self.codes = codes
+        encoded = [str(c).encode("utf-8") for c in categories]
+        self.blob = b"".join(encoded)
+        offset_dtype = np.int32 if len(self.blob) <= np.iinfo(np.int32).max else np.int64
+        self.offsets = np.zeros(len(encoded) + 1, dtype=offset_dtype)
+        np.cumsum([len(e) for e in encoded], out=self.offsets[1:])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        code = int(self.codes[row])  # int8/int16 desbordarían en code + 1
+        if code < 0:
+            return None
+        return self.blob[self.offsets[code]:self.offsets[code + 1]].decode("utf-8")
+
+    @property
+    def categories(self) -> List[str]:
+        offsets = self.offsets.tolist()
+        return [self.blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    def decode(self) -> np.ndarray:
+        return decode_categorical(self.codes, self.categories)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes) + sys.getsizeof(self.blob) + int(self.offsets.nbytes)
+
+
+def load_columnar_frame(directory: str) -> pd.DataFrame:
+    """
+    Carga la tabla columnar como DataFrame con el mismo orden de columnas del CSV
+    """
+    features, columns, meta = load_columnar(directory)
+    data: Dict[str, Any] = {}
+    for i, col in enumerate(meta["feature_columns"]):
+        data[col] = features[:, i]
+    for col, values in columns.items():
+        if isinstance(values, tuple):
+            codes, categories = values
+            data[col] = pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object))
+        else:
+            data[col] = values
+    order = [c for c in meta["column_order"] if c in data] + [c for c in meta["feature_columns"] if c not in meta["column_order"]]
+    return pd.DataFrame({col: data[col] for col in order})
+
+
+def ensure_columnar(csv_path: str, feature_columns: List[str], sep: str = "|", directory: Optional[str] = None) -> str:
+    """
+    Devuelve la carpeta columnar de un CSV, convirtiéndolo si no existe o si
+    el CSV cambió desde la última conversión
+    """
+    directory = directory or columnar_dir(csv_path)
+    meta = read_meta(directory)
+    if not os.path.exists(csv_path):
+        if meta is None:
+            raise FileNotFoundError(f"Archivo de datos no encontrado: {csv_path}")
+        return directory
+
+    signature = file_signature(csv_path, with_hash=False)
+    if meta is not None and meta["feature_columns"] == list(feature_columns):
+        source = meta.get("source", {})
+        if source.get("size") == signature["size"] and source.get("mtime_ns") == signature["mtime_ns"]:
+            return directory
+        signature = file_signature(csv_path)
+        if source.get("sha1") == signature["sha1"]:
+            # Mismo contenido con otra fecha: solo se actualiza la firma
+            meta["source"] = signature
+            # Temporal + reemplazo atómico: un lector concurrente nunca ve el JSON a medias
+            meta_path = os.path.join(directory, META_FILE)
+            tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(meta, fh, ensure_ascii=False)
+            os.replace(tmp_path, meta_path)
+            return directory
+    else:
+        signature = file_signature(csv_path)
+
+    df = pd.read_csv(csv_path, sep=sep)
+    save_columnar(df, directory, feature_columns, source=signature)
+    logger.info(f"Datos convertidos a formato columnar en {directory}")
+    return directory
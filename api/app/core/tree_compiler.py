@@ -0,0 +1,217 @@
+"""
+Compilador de modelos XGBoost a arreglos planos de NumPy.
+
+Todos los árboles se concatenan en un único arreglo de nodos:
+  - feature:   índice de la columna de cada división (int32)
+  - threshold: umbral de la división; a la izquierda si x < umbral (float32)
+  - left/right: índice global del hijo izquierdo/derecho (int32); los nodos
+    se renumeran para que el hijo derecho siempre sea left + 1
+  - default_left: rama que toma un valor faltante (NaN)
+  - value:     valor de la hoja (0 en nodos internos)
+  - roots:     nodo raíz de cada árbol
+
+En las hojas los hijos apuntan al propio nodo, así que el evaluador recorre
+todos los árboles a la vez, nivel por nivel, sin ramas en Python: tras
+'max_depth' pasos cada fila está en una hoja de cada árbol.
+
+La evaluación solo depende de numpy; xgboost se usa únicamente al compilar.
+"""
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+# Objetivos con enlace identidad: la predicción es base_score + suma de hojas
+IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:squaredlogerror", "reg:pseudohubererror", "reg:absoluteerror", "reg:quantileerror"}
+# Filas por bloque de evaluación (limita la matriz filas x árboles de índices)
+DEFAULT_ROWS_PER_CHUNK = 16384
+
+
+class CompiledForest:
+    """
+    Bosque de árboles compilado a arreglos planos, evaluado de forma vectorizada
+    """
+
+    ARRAYS = ("feature", "threshold", "left", "right", "default_left", "value", "roots")
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        base_score: float,
+        max_depth: int,
+        num_feature: int,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_score = float(base_score)
+        self.max_depth = int(max_depth)
+        self.num_feature = int(num_feature)
+
+    @property
+    def num_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.feature)
+
+    def predict(self, X: np.ndarray, rows_per_chunk: int = DEFAULT_ROWS_PER_CHUNK) -> np.ndarray:
+        """
+        Predice una matriz (filas x columnas) recorriendo todos los árboles nivel por nivel
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.num_feature:
+            raise ValueError(f"Se esperaba una matriz con {self.num_feature} columnas, se recibió {X.shape}")
+        out = np.empty(X.shape[0], dtype=np.float32)
+        for start in range(0, X.shape[0], rows_per_chunk):
+            stop = min(start + rows_per_chunk, X.shape[0])
+            out[start:stop] = self._predict_chunk(X[start:stop])
+        return out
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows = X.shape[0]
+        flat = np.ascontiguousarray(X).ravel()
+        row_offset = (np.arange(n_rows, dtype=np.int64) * self.num_feature)[:, None]
+        has_nan = bool(np.isnan(flat).any())
+        nodes = np.repeat(self.roots[None, :], n_rows, axis=0)
+        for _ in range(self.max_depth):
+            x = flat[row_offset + self.feature[nodes]]
+            # Derecha si x >= umbral (hijo derecho = izquierdo + 1); en hojas el umbral es NaN
+            go_right = x >= self.threshold[nodes]
+            if has_nan:
+                go_right |= np.isnan(x) & ~self.default_left[nodes]
+            nodes = self.left[nodes] + go_right
+        # Acumular en float64 y redondear al final, como un único float32
+        margin = self.value[nodes].sum(axis=1, dtype=np.float64) + self.base_score
+        return margin.astype(np.float32)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format_version": FORMAT_VERSION,
+            "base_score": self.base_score,
+            "max_depth": self.max_depth,
+            "num_feature": self.num_feature,
+        }
+
+    def save(self, path: str) -> str:
+        """
+        Guarda el bosque en un .npz sin comprimir (se carga en milisegundos)
+        """
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        with open(path, "wb") as fh:
+            np.savez(fh, meta=np.array(json.dumps(self.to_dict())), **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format_version") != FORMAT_VERSION:
+                raise ValueError(f"Versión de bosque compilado no soportada: {path}")
+            arrays = {name: data[name] for name in cls.ARRAYS}
+        return cls(**arrays, base_score=meta["base_score"], max_depth=meta["max_depth"], num_feature=meta["num_feature"])
+
+
+def _parse_float(value: Any) -> float:
+    # xgboost >= 3 guarda base_score como vector: '[2.06E0]'
+    return float(str(value).strip("[]").split(",")[0])
+
+
+def compile_model(model: Any, iteration_range: Optional[tuple] = None) -> CompiledForest:
+    """
+    Compila un XGBRegressor o Booster. Solo admite árboles sin divisiones
+    categóricas, de un único objetivo y con enlace identidad.
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    if iteration_range is None:
+        best_iteration = getattr(model, "best_iteration", None)
+        iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+    learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective not in IDENTITY_OBJECTIVES:
+        raise ValueError(f"Objetivo no soportado por el compilador: {objective}")
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree":
+        raise ValueError(f"Booster no soportado por el compilador: {gbm['name']}")
+    params = learner["learner_model_param"]
+    if int(params.get("num_class", 0)) > 1 or int(params.get("num_target", 1)) > 1:
+        raise ValueError("El compilador solo admite modelos de un único objetivo")
+
+    trees = gbm["model"]["trees"]
+    indptr = gbm["model"]["iteration_indptr"]
+    begin, end = iteration_range
+    if end <= 0:
+        end = len(indptr) - 1
+    trees = trees[indptr[begin]:indptr[end]]
+
+    features, thresholds, lefts, rights, defaults, values, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        if any(tree["split_type"]):
+            raise ValueError("El compilador no admite divisiones categóricas")
+        left = np.asarray(tree["left_children"], dtype=np.int32)
+        right = np.asarray(tree["right_children"], dtype=np.int32)
+        order, depth = _breadth_first(left, right)
+        new_id = np.empty(len(left), dtype=np.int32)
+        new_id[order] = np.arange(len(order), dtype=np.int32)
+        left, right = left[order], right[order]
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)[order]
+        split = np.asarray(tree["split_indices"], dtype=np.int32)[order]
+        default = np.asarray(tree["default_left"], dtype=bool)[order]
+        own = np.arange(len(order), dtype=np.int32)
+        is_leaf = left == -1
+        # Las hojas se apuntan a sí mismas y guardan su valor; con umbral NaN nunca avanzan
+        features.append(np.where(is_leaf, 0, split).astype(np.int32))
+        thresholds.append(np.where(is_leaf, np.float32(np.nan), cond).astype(np.float32))
+        lefts.append(np.where(is_leaf, own, new_id[np.maximum(left, 0)]) + offset)
+        rights.append(np.where(is_leaf, own, new_id[np.maximum(right, 0)]) + offset)
+        defaults.append(default | is_leaf)
+        values.append(np.where(is_leaf, cond, np.float32(0)).astype(np.float32))
+        roots.append(offset)
+        max_depth = max(max_depth, depth)
+        offset += len(order)
+
+    if not trees:
+        empty_i, empty_f = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return CompiledForest(empty_i, empty_f, empty_i, empty_i, np.empty(0, dtype=bool), empty_f,
+                              empty_i, _parse_float(params["base_score"]), 0, int(params["num_feature"]))
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        default_left=np.concatenate(defaults),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.int32),
+        base_score=_parse_float(params["base_score"]),
+        max_depth=max_depth,
+        num_feature=int(params["num_feature"]),
+    )
+
+
+def _breadth_first(left: np.ndarray, right: np.ndarray):
+    """
+    Orden en anchura de los nodos alcanzables (hermanos contiguos) y profundidad del árbol
+    """
+    order = [0]
+    depth = {0: 0}
+    for node in order:
+        if left[node] != -1:
+            order.extend((int(left[node]), int(right[node])))
+            depth[int(left[node])] = depth[int(right[node])] = depth[node] + 1
+    return np.asarray(order, dtype=np.int32), max(depth.values())
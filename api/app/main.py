@@ -1,6 +1,10 @@
 import os
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from .routes import family
+from .core.metrics import REGISTRY, REQUEST_SECONDS
+from .core.capture import CaptureMiddleware
 
 
 # Crear la aplicación FastAPI
@@ -13,6 +17,30 @@ app = FastAPI(
 # Incluir rutas
 app.include_router(family.router, prefix="/api/family", tags=["family"])
 
+# Captura opcional del tráfico real (CAPTURE_DIR)
+if family.traffic_capture is not None:
+    app.add_middleware(CaptureMiddleware, capture=family.traffic_capture, prefix="/api/family")
+
+@app.middleware("http")
+async def measure_requests(request: Request, call_next):
+    """
+    Registra la duración total de cada petición por endpoint (nombre de la ruta, no la URL) y código
+    """
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        endpoint = getattr(request.scope.get("route"), "name", "sin_ruta")
+        REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, endpoint=endpoint, status=status)
+
+# Métricas en formato de texto de Prometheus
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Ruta raíz (para comprobar que la API está funcionando)
 @app.get("/")
 async def root():
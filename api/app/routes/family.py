@@ -1,68 +1,579 @@
-from fastapi import APIRouter, HTTPException
-from ..schemas import FamilyBase
+from fastapi import APIRouter, HTTPException, Header, Request, Response
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import Optional
+import json
+import asyncio
+import numpy as np
+from ..schemas import FamilyBase, FamilyBatchRequest
 from ..core.model_manager import ModelManager
+from ..core.catalog import DestinationCatalog
+from ..core.destinations import destination_catalog_path, is_derived_catalog
+from ..core.retraining import RetrainingWorker
+from ..core.cache import RecommendationCache
+from ..core.shared_artifacts import SharedArtifacts
+from ..core.batcher import MicroBatcher
+from ..core.executor import ExecutorOverloaded, InferenceExecutor, parse_cpu_list
+from ..core.preferences import PreferenceResolver
+from ..core.ranking import top_k_indices, build_recommendations, recommendations_to_dicts
+from ..core.scoring import build_prediction_matrix, score_families
+from ..core.capture import TrafficCapture
+from ..core.logs import configure_logging
+from ..core.profiling import NULL_SESSION, ProfilingDenied, RequestProfiler
+from ..core.metrics import (
+    BATCH_SIZE,
+    CACHE_REQUESTS,
+    CATALOG_VERSION,
+    MODEL_INFO,
+    RECORDS_SAVED,
+    REGISTRY,
+    stage_timer,
+)
 import os
 from dotenv import load_dotenv
-import pandas as pd
 
 # Cargar variables de entorno desde .env
 dotenv_path = os.path.join(os.path.dirname(__file__), "..", "..", ".env")
 load_dotenv(dotenv_path)
 
+# Nivel de logging (cada línea lleva el PID del worker o del proceso de reentrenamiento)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+configure_logging(LOG_LEVEL)
+
 # Rutas a los archivos de datos (definidas en .env)
 DATA_PATH = os.getenv("DATA_PATH")
 NEW_DATA_PATH = os.getenv("NEW_DATA_PATH")
+# Carpeta de artefactos del modelo (opcional)
+MODEL_DIR = os.getenv("MODEL_DIR")
+# Catálogo deduplicado de destinos derivado de DATA_PATH (por defecto data/destinos.csv)
+CATALOG_PATH = os.getenv("CATALOG_PATH") or destination_catalog_path(DATA_PATH)
+# Solo se deriva (y reescribe) si no es un catálogo propio del operador: un
+# CATALOG_PATH existente que no construyó la API se carga en solo lectura
+CATALOG_DERIVED = (
+    not os.getenv("CATALOG_PATH") or not os.path.exists(CATALOG_PATH) or is_derived_catalog(CATALOG_PATH)
+)
+# Reentrenamiento en segundo plano (0 desactiva cada disparador)
+RETRAIN_INTERVAL_SECONDS = float(os.getenv("RETRAIN_INTERVAL_SECONDS", "0"))
+RETRAIN_MIN_NEW_RECORDS = int(os.getenv("RETRAIN_MIN_NEW_RECORDS", "0"))
+RETRAIN_TOLERANCE = float(os.getenv("RETRAIN_TOLERANCE", "0.05"))
+RETRAIN_NTHREAD = int(os.getenv("RETRAIN_NTHREAD", "0")) or None
+# Actualización incremental: solo boosting sobre los registros nuevos
+RETRAIN_INCREMENTAL = os.getenv("RETRAIN_INCREMENTAL", "false").lower() in ("1", "true", "yes")
+RETRAIN_MAX_NEW_TREES = int(os.getenv("RETRAIN_MAX_NEW_TREES", "50"))
+RETRAIN_FULL_EVERY = int(os.getenv("RETRAIN_FULL_EVERY", "10"))
+# Cada cuántos segundos se revisa si el catálogo de destinos cambió
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "5"))
+# Máximo de filas (familias x destinos) por llamada al modelo en el endpoint por lotes
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "250000"))
+# Micro-batching de peticiones concurrentes (ventana 0 lo desactiva)
+MICROBATCH_WINDOW_MS = float(os.getenv("MICROBATCH_WINDOW_MS", "0"))
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "32"))
+# Pool de inferencia: hilos, hilos de XGBoost por hilo, afinidad y cola máxima
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", "2"))
+INFERENCE_NTHREAD = int(os.getenv("INFERENCE_NTHREAD", "0"))
+INFERENCE_CPU_AFFINITY = parse_cpu_list(os.getenv("INFERENCE_CPU_AFFINITY", ""))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "1"))
+# Predicción directa con el booster (sin pandas) y comparación opcional con la ruta sklearn
+INFERENCE_FAST_PATH = os.getenv("INFERENCE_FAST_PATH", "true").lower() in ("1", "true", "yes")
+INFERENCE_VERIFY = os.getenv("INFERENCE_VERIFY", "false").lower() in ("1", "true", "yes")
+
+# Caché de recomendaciones (0 entradas la desactiva)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_QUANTUM = float(os.getenv("CACHE_QUANTUM", "0.01"))
+
+# Escritura por lotes de registros nuevos
+RECORD_FLUSH_SIZE = int(os.getenv("RECORD_FLUSH_SIZE", "100"))
+RECORD_FLUSH_SECONDS = float(os.getenv("RECORD_FLUSH_SECONDS", "1"))
+RECORD_FSYNC = os.getenv("RECORD_FSYNC", "true").lower() in ("1", "true", "yes")
+# Horas durante las que se recuerda cada Idempotency-Key ya usada
+RECORD_KEY_TTL_HOURS = float(os.getenv("RECORD_KEY_TTL_HOURS", "24"))
+
+# Artefactos compartidos entre workers: un proceso construye y publica; el catálogo columnar se
+# comparte por memory-map y cada worker carga su propia copia del modelo publicado
+SHARED_ARTIFACTS = os.getenv("SHARED_ARTIFACTS", "false").lower() in ("1", "true", "yes")
+SHARED_POLL_SECONDS = float(os.getenv("SHARED_POLL_SECONDS", "5"))
+
+# Métricas compartidas entre workers: carpeta donde cada proceso vuelca las suyas
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# Perfilado bajo demanda: tokens de administrador separados por comas (vacío = deshabilitado)
+PROFILE_ADMIN_TOKENS = [t.strip() for t in os.getenv("PROFILE_ADMIN_TOKENS", "").split(",") if t.strip()]
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(os.path.dirname(os.path.abspath(DATA_PATH)), "profiles")
+PROFILE_MIN_INTERVAL_SECONDS = float(os.getenv("PROFILE_MIN_INTERVAL_SECONDS", "10"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+# Captura de tráfico para reproducirlo con api/benchmarks/replay.py (vacío = deshabilitada)
+CAPTURE_DIR = os.getenv("CAPTURE_DIR")
+CAPTURE_MAX_MB = float(os.getenv("CAPTURE_MAX_MB", "50"))
+CAPTURE_BACKUPS = int(os.getenv("CAPTURE_BACKUPS", "5"))
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "1"))
 
 router = APIRouter()
 
-# Inicializar y entrenar el modelo al arrancar la app
-model_manager = ModelManager(DATA_PATH, NEW_DATA_PATH)
-model_manager.train_model() # Entrenar con los datos historicos
+REGISTRY.start(METRICS_DIR, METRICS_FLUSH_SECONDS)
+
+# Inicializar el modelo al arrancar la app (se reentrena solo si cambiaron datos o configuración)
+model_manager = ModelManager(DATA_PATH, NEW_DATA_PATH, model_dir=MODEL_DIR)
+if SHARED_ARTIFACTS:
+    shared_artifacts = SharedArtifacts(model_manager, poll_interval=SHARED_POLL_SECONDS)
+    shared_artifacts.build_or_load([DATA_PATH])
+else:
+    shared_artifacts = None
+    model_manager.load_or_train()
+model_manager.fast_inference = INFERENCE_FAST_PATH
+model_manager.verify_inference = INFERENCE_VERIFY
+
+# Vaciar periódicamente el buffer de registros nuevos
+model_manager.record_log.flush_size = RECORD_FLUSH_SIZE
+model_manager.record_log.flush_interval = RECORD_FLUSH_SECONDS
+model_manager.record_log.fsync = RECORD_FSYNC
+model_manager.record_log.key_ttl = RECORD_KEY_TTL_HOURS * 3600
+model_manager.record_log.start()
+
+# Reentrenar en otro proceso y cambiar el modelo sin detener el servicio
+retraining_worker = RetrainingWorker(
+    model_manager,
+    interval_seconds=RETRAIN_INTERVAL_SECONDS,
+    min_new_records=RETRAIN_MIN_NEW_RECORDS,
+    tolerance=RETRAIN_TOLERANCE,
+    n_jobs=RETRAIN_NTHREAD,
+    incremental=RETRAIN_INCREMENTAL,
+    max_new_trees=RETRAIN_MAX_NEW_TREES,
+    full_rebuild_every=RETRAIN_FULL_EVERY,
+)
+
+# Cargar el catálogo de destinos una sola vez y vigilar cambios en segundo plano.
+# Solo se puntúan lugares con nombre (una fila por destino), no las filas de entrenamiento.
+catalog = DestinationCatalog(
+    CATALOG_PATH,
+    model_manager.feature_columns,
+    poll_interval=CATALOG_POLL_SECONDS,
+    convert_lock=shared_artifacts.build_lock if shared_artifacts else None,
+    source_path=DATA_PATH if CATALOG_DERIVED else None,
+)
+catalog.load()
+catalog.start_watcher()
+
+# Caché de resultados; se invalida al cambiar el modelo o recargar el catálogo
+recommendation_cache = RecommendationCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, CACHE_QUANTUM)
+retraining_worker.add_swap_listener(recommendation_cache.clear)
+catalog.add_reload_listener(recommendation_cache.clear)
+
+# Versión del modelo y del catálogo en servicio para /metrics
+MODEL_INFO.replace(1, version=model_manager.model_version)
+CATALOG_VERSION.set(catalog.snapshot.version)
+retraining_worker.add_swap_listener(lambda version: MODEL_INFO.replace(1, version=version))
+catalog.add_reload_listener(lambda version: CATALOG_VERSION.set(version))
+
+if shared_artifacts:
+    # Solo el líder reentrena y publica; los demás siguen el archivo puntero
+    retraining_worker.add_swap_listener(shared_artifacts.publish)
+    shared_artifacts.add_swap_listener(recommendation_cache.clear)
+    shared_artifacts.add_swap_listener(lambda version: MODEL_INFO.replace(1, version=version))
+    shared_artifacts.add_leader_listener(retraining_worker.start)
+    shared_artifacts.try_become_leader()
+    shared_artifacts.start()
+else:
+    retraining_worker.start()
+
+# Pool acotado donde corren las predicciones de los endpoints asíncronos
+inference_executor = InferenceExecutor(
+    pool_size=INFERENCE_POOL_SIZE,
+    nthread=INFERENCE_NTHREAD,
+    max_queue=INFERENCE_MAX_QUEUE,
+    cpu_affinity=INFERENCE_CPU_AFFINITY,
+    retry_after=INFERENCE_RETRY_AFTER,
+)
+
+# Agrupador de peticiones concurrentes en una sola llamada al modelo; cada
+# lote se predice en el pool de inferencia y ocupa un solo cupo de admisión
+micro_batcher = MicroBatcher(
+    model_manager,
+    window_ms=MICROBATCH_WINDOW_MS,
+    max_batch=MICROBATCH_MAX_SIZE,
+    max_rows_per_chunk=BATCH_MAX_ROWS,
+    executor=inference_executor,
+)
+
+# Resolver de claves de preferencias -> índice de columna (precompilado)
+resolver = PreferenceResolver(model_manager.feature_columns)
+
+# Perfilado de peticiones individuales marcadas por un administrador
+request_profiler = RequestProfiler(
+    PROFILE_DIR,
+    PROFILE_ADMIN_TOKENS,
+    min_interval_seconds=PROFILE_MIN_INTERVAL_SECONDS,
+    max_files=PROFILE_MAX_FILES,
+)
+
+# Copia saneada de las peticiones reales; el middleware se agrega en main.py
+if CAPTURE_DIR:
+    traffic_capture = TrafficCapture(
+        CAPTURE_DIR,
+        max_bytes=int(CAPTURE_MAX_MB * 2**20),
+        backups=CAPTURE_BACKUPS,
+        sample_rate=CAPTURE_SAMPLE_RATE,
+    )
+    traffic_capture.start()
+else:
+    traffic_capture = None
+
+def profile_session(request: Request, operation: str):
+    """
+    Sesión de perfilado de la petición (NULL_SESSION si no se pidió); 403/429 si no procede
+    """
+    try:
+        return request_profiler.session(request, operation)
+    except ProfilingDenied as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+def finish_profile(profiling, response: Response):
+    """
+    Guarda el perfil y devuelve su identificador en el encabezado 'X-Profile-Id'
+    """
+    if profiling.save():
+        response.headers["X-Profile-Id"] = profiling.profile_id
+
+async def run_inference(fn, *args):
+    """
+    Ejecuta trabajo de inferencia en el pool acotado; con la cola llena responde 503
+    """
+    try:
+        return await inference_executor.run(fn, *args)
+    except ExecutorOverloaded as e:
+        raise overloaded_error(e)
+
+def overloaded_error(e: ExecutorOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Servidor saturado, intenta nuevamente.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def score_and_rank(model, snapshot, aggregated, present, top_k, rows=None, extras=None):
+    """
+    Predice el score de los destinos para una familia y devuelve su top-k.
+    Con 'rows' solo se predicen esas filas del catálogo (candidatos de un filtro).
+    """
+    timer = stage_timer("recommend_destinations")
+    # Solo los candidatos llegan al modelo; sin filtro, las agregadas se repiten para todos los destinos
+    features = snapshot.features[rows] if rows is not None else snapshot.features
+    buffer = model_manager.prediction_buffer(len(features))
+    X_pred = build_prediction_matrix(features, aggregated, present, out=buffer)
+    timer.mark("matrix")
+    scores = model_manager.predict_matrix(X_pred, model)
+    timer.mark("predict")
+
+    # Selección parcial del top-k sobre el arreglo de scores
+    top_idx = top_k_indices(scores, top_k)
+    recommendations = build_recommendations(snapshot.metadata, scores, top_idx, rows=rows, extras=extras)
+    timer.mark("rank")
+    return recommendations
+
+async def score_and_rank_batched(model, snapshot, aggregated, present, top_k):
+    """
+    Como score_and_rank, pero la familia se apila con otras peticiones que llegan
+    dentro de la misma ventana. La espera ocurre en el event loop; solo la
+    predicción del lote ocupa un hilo (y un cupo) del pool de inferencia.
+    """
+    timer = stage_timer("recommend_destinations")
+    try:
+        scores = await asyncio.wrap_future(micro_batcher.submit(model, snapshot.features, aggregated, present))
+    except ExecutorOverloaded as e:
+        raise overloaded_error(e)
+    timer.mark("predict")
+    top_idx = top_k_indices(scores, top_k)
+    recommendations = build_recommendations(snapshot.metadata, scores, top_idx)
+    timer.mark("rank")
+    return recommendations
 
 @router.post("/recommend_destinations")
-def recommend_destinations(family: FamilyBase, top_k: int = 3):
+async def recommend_destinations(
+    family: FamilyBase,
+    request: Request,
+    response: Response,
+    top_k: int = 3,
+    origin_lat: Optional[float] = None,
+    origin_lon: Optional[float] = None,
+    max_km: Optional[float] = None,
+    provincia: Optional[str] = None,
+    canton: Optional[str] = None,
+    parroquia: Optional[str] = None,
+):
     miembros = family.miembros
     if not miembros:
         raise HTTPException(status_code=400, detail="No se proporcionaron miembros de la familia.")
+    geo_params = (origin_lat, origin_lon, max_km)
+    geo_filter = all(p is not None for p in geo_params)
+    if any(p is not None for p in geo_params) and not geo_filter:
+        raise HTTPException(status_code=400, detail="El filtro por distancia requiere origin_lat, origin_lon y max_km.")
+    if geo_filter and (max_km <= 0 or not -90 <= origin_lat <= 90 or not -180 <= origin_lon <= 180):
+        raise HTTPException(status_code=400, detail="Origen o distancia máxima inválidos.")
 
-    aggregated_preferences = {}
-    counts = {}
+    profiling = profile_session(request, "recommend_destinations")
+    timer = stage_timer("recommend_destinations")
+    with profiling.section():
+        # Agregar preferencias de todos los miembros en un solo paso vectorizado
+        aggregated, present = resolver.aggregate(member.preferencias for member in miembros)
+        timer.mark("aggregate")
 
-    # Agregar preferencias de cada miembro
-    for member in miembros:
-        for key, value in member.preferencias.items():
-            for col in model_manager.feature_columns:
-                if key.lower() in col.lower():
-                    aggregated_preferences[col] = aggregated_preferences.get(col, 0.0) + value
-                    counts[col] = counts.get(col, 0) + 1
+        # Destinos desde el catálogo en memoria (snapshot consistente durante la petición)
+        snapshot = catalog.snapshot
+        # Tomar el modelo una sola vez para que un cambio en caliente no afecte esta petición
+        model, model_version = model_manager.model, model_manager.model_version
 
-    # Promediar
-    for col in aggregated_preferences:
-        aggregated_preferences[col] /= counts[col]
+        region_filters = {"provincia": provincia, "canton": canton, "parroquia": parroquia}
+        cache_key = recommendation_cache.make_key(
+            aggregated, present, top_k, model_version, snapshot.version, geo_params, tuple(region_filters.values())
+        )
+        # Una petición perfilada no lee la caché para que el perfil cubra la inferencia
+        recommendations = recommendation_cache.get(cache_key) if profiling is NULL_SESSION else None
+        timer.mark("cache_lookup")
+        if recommendations is not None:
+            CACHE_REQUESTS.inc(result="hit")
+            result = {"recommendations": recommendations_to_dicts(recommendations)}
+            timer.mark("serialize")
+            return result
+        CACHE_REQUESTS.inc(result="miss")
 
-    # Cargar destinos históricos
-    df_destinos = pd.read_csv(DATA_PATH, sep="|")
+        # Candidatos por región (índice invertido) y/o por radio (índice espacial)
+        rows = snapshot.region_index.query(**region_filters)
+        extras = None
+        if geo_filter:
+            geo_rows, distances = snapshot.geo_index.query_radius(origin_lat, origin_lon, max_km)
+            if rows is not None:
+                rows, keep, _ = np.intersect1d(geo_rows, rows, assume_unique=True, return_indices=True)
+                distances = distances[keep]
+            else:
+                rows = geo_rows
+            extras = {"distance_km": distances}
+        timer.mark("filter")
 
-    # Repetir agregadas para todos los destinos
-    X_pred = df_destinos[model_manager.feature_columns].copy()
-    for col in aggregated_preferences:
-        X_pred[col] = aggregated_preferences[col]
+    # Etapa externa: incluye la espera en la cola del pool (o en la ventana del lote) y las
+    # etapas matrix/predict/rank, que se registran aparte; no se suma con ellas.
+    # Una petición perfilada no se apila para que el perfil cubra su propia predicción.
+    if rows is None and micro_batcher.enabled and profiling is NULL_SESSION:
+        recommendations = await score_and_rank_batched(model, snapshot, aggregated, present, top_k)
+    else:
+        recommendations = await run_inference(
+            profiling.wrap(score_and_rank), model, snapshot, aggregated, present, top_k, rows, extras
+        )
+    timer.mark("inference_total")
+    with profiling.section():
+        recommendation_cache.put(cache_key, recommendations)
+        result = {"recommendations": recommendations_to_dicts(recommendations)}
+        timer.mark("serialize")
+    finish_profile(profiling, response)
+    return result
 
-    df_destinos["predicted_score"] = model_manager.model.predict(X_pred)
+def score_and_rank_batch(model, snapshot, aggregates, top_ks):
+    """
+    Predice varias familias apiladas por bloques y devuelve el top-k de cada una
+    """
+    all_scores = score_families(
+        model_manager,
+        model,
+        snapshot.features,
+        [agg for agg, _ in aggregates],
+        [mask for _, mask in aggregates],
+        max_rows_per_chunk=BATCH_MAX_ROWS,
+    )
+    return [
+        build_recommendations(snapshot.metadata, scores, top_k_indices(scores, top_k))
+        for scores, top_k in zip(all_scores, top_ks)
+    ]
+
+@router.post("/recommend_destinations_batch")
+async def recommend_destinations_batch(batch: FamilyBatchRequest):
+    """
+    Recomienda destinos para varias familias a la vez, apilando sus matrices
+    de predicción y llamando al modelo una vez por bloque
+    """
+    familias = batch.familias
+    if not familias:
+        raise HTTPException(status_code=400, detail="No se proporcionaron familias.")
+    for i, familia in enumerate(familias):
+        if not familia.miembros:
+            raise HTTPException(status_code=400, detail=f"La familia {i} no tiene miembros.")
+
+    timer = stage_timer("recommend_destinations_batch")
+    aggregates = [resolver.aggregate(m.preferencias for m in familia.miembros) for familia in familias]
+    timer.mark("aggregate")
+
+    snapshot = catalog.snapshot
+    model, model_version = model_manager.model, model_manager.model_version
+
+    # Resolver primero desde la caché y puntuar solo las familias restantes
+    results = [None] * len(familias)
+    cache_keys = []
+    pending = []
+    for i, (familia, (agg, mask)) in enumerate(zip(familias, aggregates)):
+        key = recommendation_cache.make_key(agg, mask, familia.top_k, model_version, snapshot.version)
+        cache_keys.append(key)
+        cached = recommendation_cache.get(key)
+        if cached is not None:
+            CACHE_REQUESTS.inc(result="hit")
+            results[i] = {"recommendations": recommendations_to_dicts(cached)}
+        else:
+            CACHE_REQUESTS.inc(result="miss")
+            pending.append(i)
+    timer.mark("cache_lookup")
+
+    if pending:
+        BATCH_SIZE.observe(len(pending), source="batch_endpoint")
+        ranked = await run_inference(
+            score_and_rank_batch,
+            model,
+            snapshot,
+            [aggregates[i] for i in pending],
+            [familias[i].top_k for i in pending],
+        )
+        timer.mark("inference")
+        for i, recommendations in zip(pending, ranked):
+            recommendation_cache.put(cache_keys[i], recommendations)
+            results[i] = {"recommendations": recommendations_to_dicts(recommendations)}
+        timer.mark("serialize")
 
-    top_destinos = df_destinos.sort_values("predicted_score", ascending=False).head(top_k)
-    recommendations = top_destinos[["nombre", "provincia", "canton", "predicted_score"]].to_dict(orient="records")
+    return {"results": results}
+
+@router.get("/cache_stats")
+def cache_stats():
+    """
+    Contadores de la caché de recomendaciones
+    """
+    return recommendation_cache.stats()
+
+@router.get("/batcher_stats")
+def batcher_stats():
+    """
+    Métricas del micro-batching: tamaño de lotes y espera en la ventana
+    """
+    return micro_batcher.stats()
+
+@router.get("/executor_stats")
+def executor_stats():
+    """
+    Estado del pool de inferencia: ocupación, cola, rechazos y ruta de predicción
+    """
+    return {**inference_executor.stats(), "inference": model_manager.inference_stats()}
 
-    return {"recommendations": recommendations}
+def require_admin(token: Optional[str]):
+    if not request_profiler.is_admin(token):
+        raise HTTPException(status_code=403, detail="Se requiere un token de administrador válido.")
+
+@router.get("/profiles")
+def list_profiles(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Perfiles guardados (más recientes primero) y contadores del perfilador
+    """
+    require_admin(x_admin_token)
+    return {**request_profiler.stats(), "profiles": request_profiler.list_profiles()}
+
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = "prof",
+    sort: str = "cumulative",
+    limit: int = 40,
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    """
+    Descarga un perfil en formato pstats ('format=prof', para snakeviz o
+    flameprof) o su resumen en texto ('format=text')
+    """
+    require_admin(x_admin_token)
+    try:
+        path = request_profiler.path(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Perfil no encontrado.")
+    if format == "text":
+        try:
+            return PlainTextResponse(request_profiler.summary(profile_id, limit=limit, sort=sort))
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Orden no válido: {sort}")
+    if format != "prof":
+        raise HTTPException(status_code=400, detail="Formato no válido: use 'prof' o 'text'.")
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
 
 @router.post("/save_family_record")
-def save_family_record(record: dict):
+def save_family_record(
+    record: dict,
+    request: Request,
+    response: Response,
+    idempotency_key: str | None = Header(default=None),
+):
     """
     Guarda un nuevo registro en CSV para futuros reentrenamientos.
     Se espera que el record contenga todas las columnas necesarias.
+    El encabezado 'Idempotency-Key' evita guardar dos veces el mismo registro
+    (reenvíos con la misma clave dentro de RECORD_KEY_TTL_HOURS); sin él, cada
+    envío se guarda aunque el contenido se repita.
     """
     if not record:
         raise HTTPException(status_code=400, detail="No se proporcionó información del registro")
-    
-    model_manager.save_new_record(record)
-    return {"status": "ok", "message": "Registro guardado"}
\ No newline at end of file
+
+    profiling = profile_session(request, "save_family_record")
+    timer = stage_timer("save_family_record")
+    with profiling.section():
+        saved = model_manager.save_new_record(record, idempotency_key)
+    timer.mark("append")
+    RECORDS_SAVED.inc(result="ok" if saved else "duplicate")
+    finish_profile(profiling, response)
+    if not saved:
+        return {"status": "duplicate", "message": "Registro ya guardado"}
+    return {"status": "ok", "message": "Registro guardado"}
+
+@router.post("/save_family_records_bulk")
+async def save_family_records_bulk(request: Request):
+    """
+    Ingesta masiva en formato NDJSON: un registro JSON por línea. Cada línea
+    puede traer 'idempotency_key' para descartar reenvíos.
+    """
+    timer = stage_timer("save_family_records_bulk")
+    body = await request.body()
+    accepted, duplicates, errors = 0, 0, []
+    for line_no, line in enumerate(body.decode("utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            errors.append({"line": line_no, "error": str(e)})
+            continue
+        if not isinstance(record, dict) or not record:
+            errors.append({"line": line_no, "error": "Se esperaba un objeto JSON no vacío"})
+            continue
+        key = record.pop("idempotency_key", None)
+        if model_manager.save_new_record(record, key):
+            accepted += 1
+        else:
+            duplicates += 1
+    timer.mark("append")
+    RECORDS_SAVED.inc(accepted, result="ok")
+    RECORDS_SAVED.inc(duplicates, result="duplicate")
+
+    # La ingesta masiva se confirma en disco antes de responder
+    model_manager.record_log.flush()
+    timer.mark("flush")
+    return {"status": "ok", "accepted": accepted, "duplicates": duplicates, "errors": errors}
+
+@router.get("/record_stats")
+def record_stats():
+    """
+    Contadores del registro de viajes nuevos
+    """
+    return model_manager.record_log.stats()
+
+@router.get("/capture_stats")
+def capture_stats():
+    """
+    Contadores de la captura de tráfico (CAPTURE_DIR)
+    """
+    if traffic_capture is None:
+        return {"enabled": False}
+    return {"enabled": True, **traffic_capture.stats()}
@@ -14,3 +14,16 @@ class FamilyBase(BaseModel):
     Representa la familia completa con todos los miembros
     """
     miembros: List[MemberBase]
+
+
+class FamilyBatchItem(FamilyBase):
+    """
+    Familia dentro de una petición por lotes, con su propio número de recomendaciones
+    """
+    top_k: int = 3
+
+class FamilyBatchRequest(BaseModel):
+    """
+    Lote de familias para recomendar en una sola llamada
+    """
+    familias: List[FamilyBatchItem]
@@ -0,0 +1,79 @@
+"""
+Reporte de memoria del catálogo de destinos: DataFrame de pandas (float64 +
+textos object por fila) frente al snapshot compacto (bloque float32, códigos
+de texto con diccionarios compartidos, lat/lon float32). El bloque de
+características queda en float32 porque es la entrada del modelo, así que
+fija el límite de la reducción (se reporta como "Límite"). Con --scale se replica el catálogo con
+nombres únicos para simular catálogos nacionales más grandes.
+
+Uso (desde la raíz del repositorio):
+    python -m api.benchmarks.catalog_memory --scale 1,10,100
+"""
+import os
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from api.app.core.catalog import DestinationCatalog
+from api.app.core.destinations import ensure_destination_catalog
+from api.app.core.model_manager import RATING_COLUMNS
+
+
+def _scaled(catalog: pd.DataFrame, scale: int) -> pd.DataFrame:
+    if scale <= 1:
+        return catalog
+    copies = []
+    for k in range(scale):
+        copy = catalog.copy()
+        copy["nombre"] = copy["nombre"].astype(str) + f" #{k}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def _mb(n_bytes: float) -> str:
+    return f"{n_bytes / 2**20:9.2f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data/datos_sintetico.csv")
+    parser.add_argument("--scale", default="1,10,100")
+    args = parser.parse_args()
+
+    # Carga original: todo el dataset de entrenamiento como DataFrame
+    training = pd.read_csv(args.data, sep="|")
+    training_bytes = int(training.memory_usage(deep=True).sum())
+    print(f"Dataset de entrenamiento como DataFrame: {len(training)} filas, {_mb(training_bytes)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = pd.read_csv(ensure_destination_catalog(args.data, RATING_COLUMNS, os.path.join(tmp, "destinos.csv")), sep="|")
+        for scale in (int(s) for s in args.scale.split(",")):
+            path = os.path.join(tmp, f"destinos_x{scale}.csv")
+            _scaled(base, scale).to_csv(path, sep="|", index=False)
+
+            # Representación anterior: el DataFrame leído del CSV
+            df = pd.read_csv(path, sep="|")
+            df_bytes = int(df.memory_usage(deep=True).sum())
+
+            snapshot = DestinationCatalog(path, RATING_COLUMNS).load()
+            usage = snapshot.memory_usage()
+            indexes = usage.pop("geo_index") + usage.pop("region_index")
+            compact = sum(usage.values())
+
+            print(f"\nCatálogo x{scale}: {len(df)} destinos")
+            print(f"  DataFrame (pandas):      {_mb(df_bytes)}")
+            print(f"  Snapshot compacto:       {_mb(compact)}  ({df_bytes / compact:.1f}x menos)")
+            for name, n_bytes in usage.items():
+                print(f"    {name:<22}{_mb(n_bytes)}")
+            print(f"  Índices (geo + región):  {_mb(indexes)}")
+            # Las características float32 son la entrada del modelo: ni con metadatos gratis se baja de ahí
+            print(f"  Límite (solo features):  {df_bytes / usage['features']:.1f}x menos")
+            if scale == 1:
+                print(f"  Frente al dataset de entrenamiento: {training_bytes / compact:.1f}x menos")
+            assert np.array_equal(snapshot.features, df[RATING_COLUMNS].to_numpy(dtype=np.float32), equal_nan=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compara el evaluador compilado de NumPy (core/tree_compiler.py) con xgboost
+para distintos tamaños de lote.
+
+Uso (desde la raíz del repositorio):
+    python -m api.benchmarks.compiled_trees --batch-sizes 1,100,4133,50000
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from api.app.core.model_manager import ModelManager
+from api.app.core.scoring import predict_matrix
+from api.app.core.tree_compiler import CompiledForest
+
+
+def _timeit(fn, repeats: int) -> float:
+    fn()  # calentamiento
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return 1000.0 * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data/datos_sintetico.csv")
+    parser.add_argument("--new-data", default="data/nuevos_viajes.csv")
+    parser.add_argument("--model-dir", default=None)
+    parser.add_argument("--batch-sizes", default="1,10,100,1000,4133,20000,100000")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    manager = ModelManager(args.data, args.new_data, model_dir=args.model_dir)
+    manager.load_or_train()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = manager.export_compiled(os.path.join(tmp, "forest.npz"))
+        start = time.perf_counter()
+        forest = CompiledForest.load(path)
+        load_ms = 1000.0 * (time.perf_counter() - start)
+        size_kb = os.path.getsize(path) / 1024
+    print(f"Bosque compilado: {forest.num_trees} árboles, {forest.num_nodes} nodos, "
+          f"profundidad {forest.max_depth}, {size_kb:.0f} KB, carga {load_ms:.2f} ms")
+
+    features = manager._load_data()[manager.feature_columns].to_numpy(dtype=np.float32)
+    rng = np.random.default_rng(0)
+    print(f"{'filas':>8} {'sklearn ms':>11} {'booster ms':>11} {'numpy ms':>10} {'máx |dif|':>11}")
+    for size in (int(s) for s in args.batch_sizes.split(",")):
+        X = np.ascontiguousarray(features[rng.integers(0, len(features), size)])
+        expected = manager.model.get_booster().inplace_predict(X)
+        max_diff = float(np.max(np.abs(forest.predict(X) - expected)))
+        repeats = max(3, args.repeats if size <= 10000 else args.repeats // 4)
+        sklearn_ms = _timeit(lambda: predict_matrix(manager.model, manager.feature_columns, X), repeats)
+        booster_ms = _timeit(lambda: manager.predict_matrix(X), repeats)
+        numpy_ms = _timeit(lambda: forest.predict(X), repeats)
+        print(f"{size:>8} {sklearn_ms:>11.3f} {booster_ms:>11.3f} {numpy_ms:>10.3f} {max_diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
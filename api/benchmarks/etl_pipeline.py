@@ -0,0 +1,300 @@
+"""
+Benchmark de los scripts ETL (union_y_preprocesamiento.py y
+generar_data_sintetica_entrenar_modelo.py) con entradas escaladas.
+
+Para cada tamaño se generan fixtures con la misma forma que
+datasets_base/atractivos_tur.csv y google_review_ratings.csv (filas reales
+remuestreadas, con identificadores y nombres únicos), se corren los dos
+pipelines completos y se registra por etapa el tiempo de pared y el pico de
+memoria. Por defecto el pico es el RSS del proceso, muestreado por un hilo
+cada pocos milisegundos (costo despreciable). Con --memory tracemalloc se
+mide la memoria asignada por Python y NumPy con más precisión, pero los
+tiempos se inflan varias veces; con --memory none solo se miden tiempos.
+
+Cada tamaño corre en un proceso propio; si ese proceso muere (por ejemplo,
+sin memoria), el reporte conserva las etapas medidas y la etapa que falló, y
+la corrida termina con código 1.
+
+Uso (desde la raíz del repositorio):
+    python -m api.benchmarks.etl_pipeline --rows 1000,10000,100000
+    python -m api.benchmarks.etl_pipeline --rows 1000000
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Los scripts están en la raíz del repositorio (en sys.path con 'python -m')
+import union_y_preprocesamiento as union
+import generar_data_sintetica_entrenar_modelo as sintetico
+
+
+def current_rss() -> int:
+    """
+    RSS actual del proceso en bytes (Linux); fuera de Linux, el máximo histórico
+    """
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RSSSampler:
+    """
+    Hilo que guarda el RSS máximo observado mientras está activo
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class StageRecorder:
+    """
+    Mide cada etapa: tiempo de pared y pico de memoria sobre lo que había al empezar
+    """
+
+    def __init__(self, memory: str = "rss", sink: Optional[str] = None):
+        self.memory = memory
+        self.sink = sink
+        self.results: List[Dict[str, Any]] = []
+        self.context: Dict[str, Any] = {}
+
+    def _emit(self, event: str, data: Dict[str, Any]):
+        # Cada evento se escribe al momento para no perderlo si el proceso muere
+        if self.sink:
+            with open(self.sink, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps({"event": event, **data}, ensure_ascii=False) + "\n")
+
+    @contextmanager
+    def stage(self, name: str):
+        gc.collect()
+        result = {**self.context, "stage": name}
+        self._emit("start", result)
+        if self.memory == "tracemalloc":
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        sampler = RSSSampler() if self.memory == "rss" else nullcontext()
+        start = time.perf_counter()
+        try:
+            with sampler:
+                base_rss = current_rss()
+                yield
+        except BaseException as e:
+            result["error"] = type(e).__name__
+            raise
+        finally:
+            result["wall_s"] = time.perf_counter() - start
+            if self.memory == "tracemalloc":
+                current, peak = tracemalloc.get_traced_memory()
+                result["peak_mb"] = (peak - base) / 2**20
+                result["retained_mb"] = (current - base) / 2**20
+            elif self.memory == "rss":
+                result["peak_mb"] = (sampler.peak - base_rss) / 2**20
+                result["rss_after_mb"] = current_rss() / 2**20
+            self.results.append(result)
+            self._emit("end", result)
+
+
+def make_fixtures(rows: int, directory: str, seed: int = 0) -> Dict[str, str]:
+    """
+    Escribe atractivos y ratings de 'rows' filas remuestreando los datasets
+    base; se reutilizan si ya existen en 'directory'
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "atractivos": os.path.join(directory, f"atractivos_tur_{rows}.csv"),
+        "ratings": os.path.join(directory, f"google_review_ratings_{rows}.csv"),
+    }
+    if all(os.path.exists(p) for p in paths.values()):
+        return paths
+
+    rng = np.random.default_rng(seed)
+    atractivos = pd.read_csv(union.ATRACTIVOS_PATH)
+    idx = rng.integers(0, len(atractivos), size=rows)
+    idx[:min(rows, len(atractivos))] = np.arange(min(rows, len(atractivos)))
+    scaled = atractivos.iloc[idx].reset_index(drop=True)
+    ids = np.arange(1, rows + 1)
+    scaled["ogc_fid"] = ids
+    scaled["FID"] = [f"atractivos_tur.{i}" for i in ids]
+    # Cada copia de un lugar es un destino distinto, así el catálogo también escala
+    copy_no = pd.Series(np.arange(rows) // max(len(atractivos), 1))
+    suffix = np.where(copy_no > 0, " #" + copy_no.astype(str), "")
+    scaled["nombre"] = scaled["nombre"].astype(str) + suffix
+    # Mismo fin de línea que el original (CRLF); así los campos con '\r' quedan entre comillas
+    scaled.to_csv(paths["atractivos"], index=False, lineterminator="\r\n")
+
+    ratings = pd.read_csv(union.RATINGS_PATH)
+    # Se remuestrean solo filas con ratings numéricos: el original tiene una fila
+    # mal formada ('2\t2.') más allá de las que usa el pipeline real
+    numeric = ratings.iloc[:, 1:].apply(pd.to_numeric, errors="coerce")
+    valid = np.flatnonzero(~(numeric.isna() & ratings.iloc[:, 1:].notna()).any(axis=1))
+    idx = valid[rng.integers(0, len(valid), size=rows)]
+    scaled = ratings.iloc[idx].reset_index(drop=True)
+    scaled[scaled.columns[0]] = [f"User {i}" for i in range(1, rows + 1)]
+    # La columna final sin nombre (coma al final de cada línea) se conserva
+    scaled.columns = ["" if str(c).startswith("Unnamed") else c for c in scaled.columns]
+    scaled.to_csv(paths["ratings"], index=False)
+    return paths
+
+
+def run_scale(rows: int, fixtures_dir: str, recorder: StageRecorder, synthetic_ratio: float, seed: int):
+    paths = make_fixtures(rows, fixtures_dir, seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        merged = os.path.join(tmp, "reseñas_con_atractivos_turisticos.csv")
+        recorder.context = {"pipeline": "union_y_preprocesamiento", "rows": rows}
+        union.run(paths["atractivos"], paths["ratings"], merged, stage=recorder.stage)
+
+        recorder.context = {"pipeline": "generar_data_sintetica", "rows": rows}
+        sintetico.run(
+            merged,
+            os.path.join(tmp, "datos_sintetico.csv"),
+            n_sinteticos=max(1, int(round(rows * synthetic_ratio))),
+            seed=seed,
+            stage=recorder.stage,
+        )
+
+
+def run_isolated(rows: int, args) -> Dict[str, Any]:
+    """
+    Corre un tamaño en un proceso propio: el pico de RSS no arrastra memoria
+    de tamaños anteriores y, si el proceso muere (p. ej. sin memoria), las
+    etapas ya medidas se conservan y se informa en qué etapa falló
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = os.path.join(tmp, "stages.ndjson")
+        cmd = [
+            sys.executable, "-m", "api.benchmarks.etl_pipeline",
+            "--rows", str(rows),
+            "--fixtures-dir", args.fixtures_dir,
+            "--synthetic-ratio", repr(args.synthetic_ratio),
+            "--seed", str(args.seed),
+            "--memory", args.memory,
+            "--worker-output", sink,
+        ]
+        returncode = subprocess.run(cmd).returncode
+        events = []
+        if os.path.exists(sink):
+            with open(sink, encoding="utf-8") as fh:
+                events = [json.loads(line) for line in fh if line.strip()]
+
+    stages = [{k: v for k, v in e.items() if k != "event"} for e in events if e["event"] == "end"]
+    outcome = {"rows": rows, "returncode": returncode, "stages": stages}
+    if returncode != 0:
+        # Etapa con excepción, o la última que empezó y nunca terminó (proceso muerto)
+        started = [e for e in events if e["event"] == "start"]
+        failed = [e for e in stages if "error" in e]
+        last = failed[-1] if failed else (started[-1] if len(started) > len(stages) else None)
+        if last is not None:
+            outcome["failed_stage"] = {"pipeline": last["pipeline"], "stage": last["stage"]}
+    return outcome
+
+
+def print_table(results: List[Dict[str, Any]]):
+    print(f"{'pipeline':<26} {'filas':>9} {'etapa':<24} {'tiempo':>10} {'pico':>11}")
+    for r in results:
+        peak = f"{r['peak_mb']:8.1f} MB" if "peak_mb" in r else ""
+        print(f"{r['pipeline']:<26} {r['rows']:>9} {r['stage']:<24} {r['wall_s']:9.3f}s {peak:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,10000,100000")
+    parser.add_argument("--fixtures-dir", default="api/benchmarks/results/fixtures")
+    parser.add_argument(
+        "--synthetic-ratio", type=float, default=None,
+        help="Filas sintéticas por fila real (por defecto la misma proporción que el dataset actual)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory", choices=["rss", "tracemalloc", "none"], default="rss")
+    parser.add_argument("--output", default="api/benchmarks/results/etl_pipeline.json")
+    parser.add_argument("--worker-output", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.synthetic_ratio is None:
+        # 3000 filas sintéticas por cada 1133 reales
+        real_rows = min(len(pd.read_csv(union.ATRACTIVOS_PATH)), len(pd.read_csv(union.RATINGS_PATH)))
+        args.synthetic_ratio = sintetico.N / real_rows
+
+    if args.worker_output:
+        # Proceso hijo: un solo tamaño, etapas escritas en 'worker_output'
+        recorder = StageRecorder(memory=args.memory, sink=args.worker_output)
+        if args.memory == "tracemalloc":
+            tracemalloc.start()
+        run_scale(int(args.rows), args.fixtures_dir, recorder, args.synthetic_ratio, args.seed)
+        return
+
+    results, failures = [], []
+    for rows in (int(r) for r in args.rows.split(",")):
+        print(f"== {rows} filas")
+        outcome = run_isolated(rows, args)
+        results.extend(outcome["stages"])
+        if outcome["returncode"] != 0:
+            failure = {"rows": rows, "returncode": outcome["returncode"], **outcome.get("failed_stage", {})}
+            failures.append(failure)
+            print(f"El proceso de {rows} filas terminó con código {outcome['returncode']}"
+                  f" en la etapa {failure.get('pipeline', '?')}/{failure.get('stage', '?')}")
+
+    print_table(results)
+    totals: Dict[str, float] = {}
+    for r in results:
+        key = f"{r['pipeline']}@{r['rows']}"
+        totals[key] = totals.get(key, 0.0) + r["wall_s"]
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "rows": args.rows,
+            "synthetic_ratio": args.synthetic_ratio,
+            "seed": args.seed,
+            "memory": args.memory,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "stages": results,
+        "totals_s": totals,
+        "failures": failures,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    print(f"Reporte guardado en {args.output}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
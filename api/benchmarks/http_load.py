@@ -0,0 +1,338 @@
+"""
+Prueba de carga HTTP de la API: genera familias como las que envía el
+frontend (format_family_data: solo preferencias con rating > 0, 1 a 6
+miembros), llama a /recommend_destinations y /save_family_record con la
+concurrencia indicada y guarda rendimiento y p50/p95/p99 en JSON. Si se
+supera algún presupuesto de http_budgets.json, termina con código 1.
+
+Sin --url levanta la API con uvicorn en localhost (en otro proceso, para no
+compartir el GIL con el generador de carga), con la caché de recomendaciones
+desactivada salvo con --cache, y guarda los registros en una copia temporal
+de NEW_DATA_PATH. Cada nivel de concurrencia usa familias y registros
+distintos, y cada registro se envía con su propio Idempotency-Key.
+
+Uso (desde la raíz del repositorio):
+    python -m api.benchmarks.http_load --concurrency 1,8,32 --requests 400
+    python -m api.benchmarks.http_load --url http://localhost:8000 --no-budgets
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+
+# Mismo orden y nombres que pref_mapping en frontend/utils/api_client.py
+PREFERENCE_ITEMS = [
+    "iglesias", "resorts", "playas", "parques", "teatros", "museos",
+    "centros_comerciales", "zoologicos", "restaurantes", "bares_pubs",
+    "servicios_locales", "pizzerias_hamburgueserias", "hoteles_alojamientos",
+    "juguerias", "galerias_arte", "discotecas", "piscinas", "gimnasios",
+    "panaderias", "belleza_spas", "cafeterias", "miradores", "monumentos", "jardines",
+]
+FAMILY_ROLES = ["Padres", "Hijos (Adolescentes 13-17)", "Hijos (Adultos 18+)", "Abuelos", "Otro"]
+# Distribución de miembros por familia (1 a 6)
+MEMBER_WEIGHTS = [0.10, 0.25, 0.25, 0.25, 0.10, 0.05]
+TOP_K_CHOICES = [3, 3, 5, 10]
+ENDPOINTS = {
+    "recommend_destinations": "/api/family/recommend_destinations",
+    "save_family_record": "/api/family/save_family_record",
+}
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "http_budgets.json")
+
+
+def _rating(rng: random.Random) -> float:
+    # En el frontend un clic en la tarjeta da 5 estrellas; el resto se elige a mano
+    return 5.0 if rng.random() < 0.6 else float(rng.randint(1, 4))
+
+
+def generate_family(rng: random.Random) -> Dict[str, Any]:
+    """
+    Familia con el formato de format_family_data: cada miembro tiene su propia
+    densidad de preferencias (de 1 a todas las categorías)
+    """
+    n_members = rng.choices(range(1, len(MEMBER_WEIGHTS) + 1), weights=MEMBER_WEIGHTS)[0]
+    miembros = []
+    for i in range(n_members):
+        density = rng.uniform(0.05, 0.8)
+        items = [item for item in PREFERENCE_ITEMS if rng.random() < density] or [rng.choice(PREFERENCE_ITEMS)]
+        miembros.append({
+            "nombre": f"Miembro {i + 1}",
+            "rol": rng.choice(FAMILY_ROLES),
+            "preferencias": {f"Calif promedio {item}": _rating(rng) for item in items},
+        })
+    return {"miembros": miembros}
+
+
+def generate_record(rng: random.Random, places: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Registro de viaje con todas las columnas de nuevos_viajes.csv: calificaciones 0-5 y un lugar real
+    """
+    record = {f"Calif promedio {item}": rng.choice([0, 0, 1, 2, 3, 4, 5]) for item in PREFERENCE_ITEMS}
+    record.update(rng.choice(places))
+    return record
+
+
+def load_places(data_path: str, limit: int = 2000) -> List[Dict[str, Any]]:
+    from api.app.core.destinations import destination_catalog_path
+
+    path = destination_catalog_path(data_path)
+    if not os.path.exists(path):
+        path = data_path
+    cols = ["provincia", "canton", "parroquia", "nombre", "lat", "lon"]
+    df = pd.read_csv(path, sep="|", usecols=cols).dropna(subset=["nombre"]).head(limit)
+    return [{k: (None if pd.isna(v) else v) for k, v in row.items()} for row in df[cols].to_dict("records")]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ms = np.asarray(latencies, dtype=np.float64) * 1000.0
+    total = len(latencies) + errors
+    if len(ms) == 0:
+        return {"requests": total, "errors": errors, "error_rate": 1.0 if total else 0.0, "throughput_rps": 0.0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total,
+        "throughput_rps": len(ms) / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    payloads: List[Dict[str, Any]],
+    concurrency: int,
+    n_requests: int,
+    warmup: int,
+    seed: int,
+) -> Dict[str, Any]:
+    """
+    'concurrency' clientes lanzan peticiones sin pausa hasta completar
+    'n_requests'; las de calentamiento no cuentan
+    """
+    rng = random.Random(seed)
+    path = ENDPOINTS[endpoint]
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    remaining = 0
+
+    async def worker(measure: bool):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            payload = rng.choice(payloads)
+            params, headers = None, None
+            if endpoint == "recommend_destinations":
+                params = {"top_k": rng.choice(TOP_K_CHOICES)}
+            else:
+                # Clave única: ningún envío se descarta como reenvío
+                headers = {"Idempotency-Key": uuid.uuid4().hex}
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload, params=params, headers=headers)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if measure:
+                status_codes[status] = status_codes.get(status, 0) + 1
+                if status == "200":
+                    latencies.append(elapsed)
+
+    # Calentamiento en serie, fuera de la medición
+    remaining = warmup
+    await worker(measure=False)
+    remaining = n_requests
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(measure=True) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    result = summarize(latencies, n_requests - len(latencies), elapsed)
+    result.update({"endpoint": endpoint, "concurrency": concurrency, "status_codes": status_codes})
+    return result
+
+
+def check_budgets(results: List[Dict[str, Any]], budgets: Dict[str, Any]) -> List[str]:
+    """
+    Compara cada escenario con su presupuesto (por endpoint y concurrencia).
+    Los límites '*_ms' y 'max_error_rate' son máximos; 'min_rps' es mínimo.
+    """
+    violations = []
+    for result in results:
+        budget = budgets.get(result["endpoint"], {}).get(str(result["concurrency"]))
+        if not budget:
+            continue
+        name = f"{result['endpoint']}@{result['concurrency']}"
+        for key, limit in budget.items():
+            if key == "min_rps":
+                if result["throughput_rps"] < limit:
+                    violations.append(f"{name}: {result['throughput_rps']:.1f} req/s < {limit} req/s")
+            elif key == "max_error_rate":
+                if result["error_rate"] > limit:
+                    violations.append(f"{name}: tasa de error {result['error_rate']:.3f} > {limit}")
+            elif result.get(key, float("inf")) > limit:
+                violations.append(f"{name}: {key} {result.get(key, float('nan')):.1f} > {limit}")
+    return violations
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, tmp: str) -> Tuple[subprocess.Popen, str]:
+    """
+    Levanta la API con uvicorn en localhost y espera a que responda
+    """
+    port = _free_port()
+    env = dict(os.environ)
+    env["DATA_PATH"] = os.path.abspath(args.data)
+    # Los registros de la prueba no deben terminar en el dataset real
+    new_data = os.path.join(tmp, "nuevos_viajes.csv")
+    if os.path.exists(args.new_data):
+        shutil.copyfile(args.new_data, new_data)
+    env["NEW_DATA_PATH"] = new_data
+    if not getattr(args, "cache", False):
+        # Sin caché cada petición llega al modelo (si no, se mide la caché)
+        env["CACHE_MAX_ENTRIES"] = "0"
+    if args.model_dir:
+        env["MODEL_DIR"] = os.path.abspath(args.model_dir)
+    api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--app-dir", api_dir, "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+    server = subprocess.Popen(cmd, env=env, cwd=tmp)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"La API terminó al arrancar (código {server.returncode}).")
+        try:
+            if httpx.get(url + "/", timeout=1.0).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"La API no respondió en {args.startup_timeout} s.")
+
+
+async def run_all(args, url: str, places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                # Cargas nuevas en cada nivel: un nivel no reutiliza lo que ya cacheó o guardó el anterior
+                if endpoint == "recommend_destinations":
+                    payloads = [generate_family(rng) for _ in range(args.distinct_families)]
+                else:
+                    payloads = [generate_record(rng, places) for _ in range(args.distinct_families)]
+                result = await run_scenario(
+                    client, endpoint, payloads, concurrency, args.requests, args.warmup, args.seed
+                )
+                results.append(result)
+                print(
+                    f"{endpoint:<24} c={concurrency:<4} {result['throughput_rps']:8.1f} req/s  "
+                    f"p50 {result.get('p50_ms', float('nan')):7.2f} ms  p95 {result.get('p95_ms', float('nan')):7.2f} ms  "
+                    f"p99 {result.get('p99_ms', float('nan')):7.2f} ms  errores {result['errors']}"
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="API ya levantada; si falta se levanta una en localhost")
+    parser.add_argument("--data", default="data/datos_sintetico.csv")
+    parser.add_argument("--new-data", default="data/nuevos_viajes.csv")
+    parser.add_argument("--model-dir", default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cache", action="store_true", help="Mantener la caché de recomendaciones de la API levantada")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=400, help="Peticiones medidas por escenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--distinct-families", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output", default="api/benchmarks/results/http_load.json")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS)
+    parser.add_argument("--no-budgets", action="store_true")
+    args = parser.parse_args()
+    args.endpoints = [e for e in args.endpoints.split(",") if e]
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Endpoints desconocidos: {', '.join(sorted(unknown))}")
+
+    places = load_places(args.data)
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        url = args.url
+        if url is None:
+            server, url = start_server(args, tmp)
+        try:
+            results = asyncio.run(run_all(args, url, places))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    budgets = {}
+    if not args.no_budgets and os.path.exists(args.budgets):
+        with open(args.budgets, encoding="utf-8") as fh:
+            budgets = json.load(fh)
+    violations = check_budgets(results, budgets)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "url": args.url or "localhost (levantada por la prueba)",
+            "workers": args.workers if args.url is None else None,
+            "cache": args.cache if args.url is None else None,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "distinct_families": args.distinct_families,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+        "budgets": args.budgets if budgets else None,
+        "violations": violations,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    print(f"Reporte guardado en {args.output}")
+
+    if violations:
+        print("Presupuestos superados:")
+        for violation in violations:
+            print(f"  - {violation}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
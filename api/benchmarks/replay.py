@@ -0,0 +1,346 @@
+"""
+Reproduce tráfico capturado (CAPTURE_DIR, ver api/app/core/capture.py) contra
+una API local y compara dos corridas: distribución de latencias por endpoint y
+recomendaciones devueltas para cada petición.
+
+Uso (desde la raíz del repositorio):
+    # Reproducir al ritmo original (--speed 1), 4 veces más rápido o sin pausas (--speed 0)
+    python -m api.benchmarks.replay run capturas/ --speed 4 --label actual --output run_a.json
+    MODEL_DIR=otros_modelos python -m api.benchmarks.replay run capturas/ --speed 4 --output run_b.json
+
+    # Comparar dos corridas (o una corrida con la captura original)
+    python -m api.benchmarks.replay diff run_a.json run_b.json --fail-on-change
+    python -m api.benchmarks.replay diff capturas/ run_b.json
+
+Sin --url, 'run' levanta la API en localhost igual que http_load.py, así los
+registros reenviados a /save_family_record van a una copia temporal.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Any, Dict, List
+
+import httpx
+
+from .http_load import ENDPOINTS, start_server, summarize
+
+
+def capture_files(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "capture_*.ndjson*")))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def load_capture(paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Entradas de todas las capturas (incluidos los archivos rotados) en orden
+    de llegada; 'id' es la posición, común a todas las corridas
+    """
+    entries = []
+    for path in capture_files(paths):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    entries.append(json.loads(line))
+    entries.sort(key=lambda e: e["ts"])
+    for i, entry in enumerate(entries):
+        entry["id"] = i
+    return entries
+
+
+def capture_as_run(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    La captura original con el mismo formato que una corrida reproducida
+    """
+    requests = [
+        {
+            "id": e["id"],
+            "endpoint": e["endpoint"],
+            "status": e["status"],
+            "latency_ms": e["duration_ms"],
+            "recommendations": e.get("recommendations"),
+        }
+        for e in entries
+    ]
+    return {"label": "captura", "requests": requests, "summary": summarize_run(requests)}
+
+
+def summarize_run(requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {}
+    for endpoint in sorted({r["endpoint"] for r in requests}):
+        rows = [r for r in requests if r["endpoint"] == endpoint]
+        ok = [r["latency_ms"] / 1000.0 for r in rows if r["status"] == 200]
+        # Sin duración de la corrida completa, el rendimiento no aplica
+        stats = summarize(ok, len(rows) - len(ok), 0.0)
+        stats.pop("throughput_rps", None)
+        summary[endpoint] = stats
+    return summary
+
+
+async def replay(
+    entries: List[Dict[str, Any]],
+    url: str,
+    speed: float,
+    max_in_flight: int,
+    timeout: float,
+) -> List[Dict[str, Any]]:
+    """
+    Reenvía cada entrada en su instante original dividido por 'speed'
+    (speed=0: sin pausas, solo limitado por 'max_in_flight')
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+    t0 = entries[0]["ts"] if entries else 0.0
+    results: List[Dict[str, Any]] = []
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        start = time.perf_counter()
+
+        async def send(entry):
+            if speed > 0:
+                delay = (entry["ts"] - t0) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            async with semaphore:
+                scheduled = (entry["ts"] - t0) / speed if speed > 0 else 0.0
+                lag = time.perf_counter() - start - scheduled
+                sent = time.perf_counter()
+                try:
+                    response = await client.request(
+                        entry["method"], ENDPOINTS[entry["endpoint"]], params=entry.get("query"), json=entry["body"]
+                    )
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latency = time.perf_counter() - sent
+            recommendations = None
+            if status == 200 and entry["endpoint"] == "recommend_destinations":
+                recommendations = [
+                    {key: rec.get(key) for key in ("nombre", "provincia", "canton", "predicted_score")}
+                    for rec in response.json().get("recommendations", [])
+                ]
+            results.append({
+                "id": entry["id"],
+                "endpoint": entry["endpoint"],
+                "status": status,
+                "latency_ms": latency * 1000.0,
+                "lag_ms": max(0.0, lag * 1000.0) if speed > 0 else None,
+                "recommendations": recommendations,
+            })
+
+        await asyncio.gather(*(send(entry) for entry in entries))
+    return sorted(results, key=lambda r: r["id"])
+
+
+def _key(rec: Dict[str, Any]) -> tuple:
+    return rec.get("nombre"), rec.get("provincia"), rec.get("canton")
+
+
+def diff_runs(a: Dict[str, Any], b: Dict[str, Any], score_tolerance: float = 1e-4, max_examples: int = 10) -> Dict[str, Any]:
+    """
+    Compara latencias por endpoint y, petición por petición, las listas de
+    recomendaciones (mismo orden, mismo conjunto, solapamiento y scores)
+    """
+    latency = {}
+    for endpoint in sorted(set(a["summary"]) | set(b["summary"])):
+        sa, sb = a["summary"].get(endpoint, {}), b["summary"].get(endpoint, {})
+        latency[endpoint] = {}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "error_rate"):
+            va, vb = sa.get(key), sb.get(key)
+            delta = None if va is None or vb is None else vb - va
+            pct = None if delta is None or not va else 100.0 * delta / va
+            latency[endpoint][key] = {"a": va, "b": vb, "delta": delta, "delta_pct": pct}
+
+    by_id = {r["id"]: r for r in b["requests"]}
+    compared = identical = same_set = 0
+    overlap_sum = top1_agree = 0.0
+    max_score_diff = 0.0
+    status_changes, examples = 0, []
+    for ra in a["requests"]:
+        rb = by_id.get(ra["id"])
+        if rb is None or ra["endpoint"] != rb["endpoint"]:
+            continue
+        if ra["status"] != rb["status"]:
+            status_changes += 1
+        la, lb = ra.get("recommendations"), rb.get("recommendations")
+        if la is None or lb is None:
+            continue
+        compared += 1
+        keys_a, keys_b = [_key(r) for r in la], [_key(r) for r in lb]
+        scores_b = {_key(r): r.get("predicted_score") for r in lb}
+        score_diff = max(
+            (abs(r["predicted_score"] - scores_b[_key(r)]) for r in la
+             if _key(r) in scores_b and r.get("predicted_score") is not None and scores_b[_key(r)] is not None),
+            default=0.0,
+        )
+        max_score_diff = max(max_score_diff, score_diff)
+        k = max(len(keys_a), len(keys_b), 1)
+        overlap_sum += len(set(keys_a) & set(keys_b)) / k
+        top1_agree += bool(keys_a) and bool(keys_b) and keys_a[0] == keys_b[0]
+        same_set += set(keys_a) == set(keys_b)
+        if keys_a == keys_b and score_diff <= score_tolerance:
+            identical += 1
+        elif len(examples) < max_examples:
+            examples.append({
+                "id": ra["id"],
+                "a": [r.get("nombre") for r in la],
+                "b": [r.get("nombre") for r in lb],
+                "max_score_diff": score_diff,
+            })
+
+    return {
+        "a": a.get("label"),
+        "b": b.get("label"),
+        "latency": latency,
+        "recommendations": {
+            "compared": compared,
+            "identical": identical,
+            "changed": compared - identical,
+            "same_set": same_set,
+            "mean_overlap": overlap_sum / compared if compared else None,
+            "top1_agreement": top1_agree / compared if compared else None,
+            "max_score_diff": max_score_diff,
+            "status_changes": status_changes,
+            "examples": examples,
+        },
+    }
+
+
+def load_run(path: str) -> Dict[str, Any]:
+    if os.path.isdir(path) or ".ndjson" in os.path.basename(path):
+        return capture_as_run(load_capture([path]))
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def cmd_run(args):
+    entries = load_capture(args.capture)
+    if args.endpoints:
+        wanted = set(args.endpoints.split(","))
+        entries = [e for e in entries if e["endpoint"] in wanted]
+    entries = [e for e in entries if e["endpoint"] in ENDPOINTS]
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        sys.exit("La captura no tiene peticiones para reproducir.")
+    span = entries[-1]["ts"] - entries[0]["ts"]
+    print(f"{len(entries)} peticiones capturadas en {span:.1f} s; velocidad {args.speed or 'sin pausas'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server, url = None, args.url
+        if url is None:
+            server, url = start_server(args, tmp)
+        try:
+            start = time.perf_counter()
+            requests = asyncio.run(replay(entries, url, args.speed, args.max_in_flight, args.timeout))
+            elapsed = time.perf_counter() - start
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    run = {
+        "label": args.label,
+        "url": args.url or "localhost (levantada por la prueba)",
+        "speed": args.speed,
+        # Igual que en http_load: la API levantada por la prueba corre sin caché salvo con --cache
+        "cache": args.cache if args.url is None else None,
+        "elapsed_s": elapsed,
+        "summary": summarize_run(requests),
+        "requests": requests,
+    }
+    lags = [r["lag_ms"] for r in requests if r.get("lag_ms") is not None]
+    if lags:
+        run["max_lag_ms"] = max(lags)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(run, fh, indent=2, ensure_ascii=False)
+    for endpoint, stats in run["summary"].items():
+        print(f"{endpoint:<24} {stats['requests']:6d} peticiones  p50 {stats.get('p50_ms', float('nan')):7.2f} ms  "
+              f"p95 {stats.get('p95_ms', float('nan')):7.2f} ms  p99 {stats.get('p99_ms', float('nan')):7.2f} ms  "
+              f"errores {stats['errors']}")
+    print(f"Corrida guardada en {args.output}")
+
+
+def cmd_diff(args):
+    a, b = load_run(args.a), load_run(args.b)
+    result = diff_runs(a, b, score_tolerance=args.score_tolerance)
+    for endpoint, stats in result["latency"].items():
+        parts = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            s = stats[key]
+            if s["a"] is not None and s["b"] is not None:
+                pct = f" ({s['delta_pct']:+.1f}%)" if s["delta_pct"] is not None else ""
+                parts.append(f"{key[:3]} {s['a']:.2f} -> {s['b']:.2f} ms{pct}")
+        print(f"{endpoint:<24} " + "  ".join(parts))
+    recs = result["recommendations"]
+    if recs["compared"]:
+        print(
+            f"Recomendaciones: {recs['identical']}/{recs['compared']} idénticas, "
+            f"{recs['same_set']} con el mismo conjunto, solapamiento medio {recs['mean_overlap']:.3f}, "
+            f"top-1 igual {recs['top1_agreement']:.3f}, máx. diferencia de score {recs['max_score_diff']:.2e}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2, ensure_ascii=False)
+
+    failures = []
+    if args.fail_on_change and (recs["changed"] or recs["status_changes"]):
+        failures.append(f"{recs['changed']} listas de recomendaciones y {recs['status_changes']} códigos distintos")
+    if args.max_p95_regression is not None:
+        for endpoint, stats in result["latency"].items():
+            pct = stats["p95_ms"]["delta_pct"]
+            if pct is not None and pct > args.max_p95_regression:
+                failures.append(f"{endpoint}: p95 {pct:+.1f}% > {args.max_p95_regression}%")
+    if failures:
+        print("Regresiones:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Reproduce una captura y guarda la corrida")
+    run.add_argument("capture", nargs="+", help="Archivos capture_*.ndjson o la carpeta CAPTURE_DIR")
+    run.add_argument("--url", default=None, help="API ya levantada; si falta se levanta una en localhost")
+    run.add_argument("--speed", type=float, default=1.0, help="1 = ritmo original, 4 = 4x más rápido, 0 = sin pausas")
+    run.add_argument("--max-in-flight", type=int, default=64)
+    run.add_argument("--endpoints", default=None)
+    run.add_argument("--limit", type=int, default=0)
+    run.add_argument("--label", default=None)
+    run.add_argument("--output", default="api/benchmarks/results/replay.json")
+    run.add_argument("--data", default="data/datos_sintetico.csv")
+    run.add_argument("--new-data", default="data/nuevos_viajes.csv")
+    run.add_argument("--model-dir", default=None)
+    run.add_argument("--workers", type=int, default=1)
+    run.add_argument("--cache", action="store_true", help="Mantener la caché de recomendaciones de la API levantada")
+    run.add_argument("--timeout", type=float, default=30.0)
+    run.add_argument("--startup-timeout", type=float, default=120.0)
+    run.set_defaults(func=cmd_run)
+
+    diff = sub.add_parser("diff", help="Compara dos corridas (o una corrida con la captura)")
+    diff.add_argument("a")
+    diff.add_argument("b")
+    diff.add_argument("--score-tolerance", type=float, default=1e-4)
+    diff.add_argument("--fail-on-change", action="store_true", help="Termina con código 1 si cambia alguna recomendación")
+    diff.add_argument("--max-p95-regression", type=float, default=None, help="Porcentaje máximo de aumento del p95")
+    diff.add_argument("--output", default=None)
+    diff.set_defaults(func=cmd_diff)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
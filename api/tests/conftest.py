@@ -0,0 +1,56 @@
+"""
+Fixtures compartidas: un modelo entrenado con el dataset base y el catálogo
+de destinos derivado de él, ambos en carpetas temporales.
+
+Desde la raíz del repositorio:
+    python -m pytest api/tests
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from api.app.core.catalog import DestinationCatalog
+from api.app.core.model_manager import ModelManager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_PATH = os.path.join(REPO_ROOT, "data", "datos_sintetico.csv")
+NEW_DATA_PATH = os.path.join(REPO_ROOT, "data", "nuevos_viajes.csv")
+
+
+@pytest.fixture(scope="session")
+def manager(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("modelo")
+    new_data = tmp / "nuevos_viajes.csv"
+    shutil.copyfile(NEW_DATA_PATH, new_data)
+    manager = ModelManager(DATA_PATH, str(new_data), model_dir=str(tmp / "models"))
+    manager.train_model(n_jobs=1, include_new_records=False)
+    return manager
+
+
+@pytest.fixture(scope="session")
+def snapshot(manager, tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("catalogo")
+    catalog = DestinationCatalog(
+        str(tmp / "destinos.csv"), manager.feature_columns, poll_interval=0, source_path=DATA_PATH
+    )
+    return catalog.load()
+
+
+@pytest.fixture(scope="session")
+def family_preferences(manager):
+    """
+    Medias agregadas y máscaras de presencia de familias aleatorias (como las
+    que arma /recommend_destinations), de pocas a todas las preferencias
+    """
+    rng = np.random.default_rng(0)
+    n_features = len(manager.feature_columns)
+    aggregated, present = [], []
+    for density in (0.05, 0.2, 0.5, 1.0):
+        for _ in range(3):
+            mask = rng.random(n_features) < density
+            mask[rng.integers(n_features)] = True
+            aggregated.append(np.where(mask, rng.integers(1, 6, n_features), 0).astype(np.float32))
+            present.append(mask)
+    return aggregated, present
@@ -0,0 +1,67 @@
+"""
+Entrega de resultados del micro-batching cuando una de las peticiones del
+lote se canceló (cliente desconectado) antes de que termine la predicción.
+"""
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from api.app.core.batcher import MicroBatcher
+from api.app.core.scoring import build_prediction_matrix
+
+
+class HeldExecutor:
+    """
+    Executor de prueba: guarda el trabajo enviado y lo completa cuando el test lo pide
+    """
+
+    def __init__(self):
+        self.submitted = threading.Event()
+        self.job = None
+
+    def submit(self, fn, *args):
+        self.job = (fn, args, Future())
+        self.submitted.set()
+        return self.job[2]
+
+    def complete(self):
+        fn, args, future = self.job
+        future.set_result(fn(*args))
+
+    def fail(self, error):
+        self.job[2].set_exception(error)
+
+
+def submit_batch(manager, snapshot, family_preferences, n=3):
+    executor = HeldExecutor()
+    batcher = MicroBatcher(manager, window_ms=5000, max_batch=n, executor=executor)
+    aggregated, present = family_preferences
+    futures = [
+        batcher.submit(manager.model, snapshot.features, aggregated[i], present[i]) for i in range(n)
+    ]
+    assert executor.submitted.wait(timeout=10)
+    return executor, futures
+
+
+def test_cancelled_waiter_does_not_block_the_rest(manager, snapshot, family_preferences):
+    executor, futures = submit_batch(manager, snapshot, family_preferences)
+    assert futures[0].cancel()
+    executor.complete()
+
+    assert futures[0].cancelled()
+    aggregated, present = family_preferences
+    for i, future in enumerate(futures[1:], start=1):
+        expected = manager.predict_matrix(build_prediction_matrix(snapshot.features, aggregated[i], present[i]))
+        np.testing.assert_array_equal(future.result(timeout=5), expected)
+
+
+def test_cancelled_waiter_does_not_block_errors(manager, snapshot, family_preferences):
+    executor, futures = submit_batch(manager, snapshot, family_preferences)
+    assert futures[1].cancel()
+    executor.fail(RuntimeError("fallo del lote"))
+
+    for future in (futures[0], futures[2]):
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
@@ -0,0 +1,62 @@
+"""
+La ruta rápida (booster.inplace_predict sobre buffers float32) debe dar los
+mismos scores que la ruta original: model.predict sobre un DataFrame float64.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.app.core.scoring import build_prediction_matrix, score_families
+
+
+def baseline_predict(manager, X: np.ndarray) -> np.ndarray:
+    return manager.model.predict(pd.DataFrame(np.asarray(X, dtype=np.float64), columns=manager.feature_columns))
+
+
+@pytest.fixture
+def fast_manager(manager):
+    manager.fast_inference = True
+    manager.verify_inference = False
+    return manager
+
+
+def test_training_features(fast_manager):
+    X = fast_manager._load_data()[fast_manager.feature_columns].to_numpy(dtype=np.float32)
+    np.testing.assert_array_equal(fast_manager.predict_matrix(X), baseline_predict(fast_manager, X))
+
+
+def test_family_matrices(fast_manager, snapshot, family_preferences):
+    for aggregated, present in zip(*family_preferences):
+        X = build_prediction_matrix(snapshot.features, aggregated, present)
+        np.testing.assert_array_equal(fast_manager.predict_matrix(X), baseline_predict(fast_manager, X))
+
+
+def test_stacked_families(fast_manager, snapshot, family_preferences):
+    aggregated, present = family_preferences
+    # Bloques pequeños para pasar también por la división en varios trozos
+    scores = score_families(
+        fast_manager, fast_manager.model, snapshot.features, aggregated, present, max_rows_per_chunk=3 * len(snapshot)
+    )
+    for s, agg, mask in zip(scores, aggregated, present):
+        X = build_prediction_matrix(snapshot.features, agg, mask)
+        np.testing.assert_array_equal(s, baseline_predict(fast_manager, X))
+
+
+def test_float64_and_missing_values(fast_manager, snapshot):
+    # Entradas float64 (se copian al buffer float32) con valores faltantes
+    X = np.array(snapshot.features, dtype=np.float64)
+    X[np.random.default_rng(1).random(X.shape) < 0.1] = np.nan
+    np.testing.assert_array_equal(fast_manager.predict_matrix(X), baseline_predict(fast_manager, X))
+
+
+def test_verify_mode_finds_no_mismatches(fast_manager, snapshot, family_preferences):
+    before = fast_manager.inference_stats()
+    fast_manager.verify_inference = True
+    try:
+        for aggregated, present in zip(*family_preferences):
+            fast_manager.predict_matrix(build_prediction_matrix(snapshot.features, aggregated, present))
+    finally:
+        fast_manager.verify_inference = False
+    after = fast_manager.inference_stats()
+    assert after["verified_predictions"] - before["verified_predictions"] == len(family_preferences[0])
+    assert after["prediction_mismatches"] == before["prediction_mismatches"]
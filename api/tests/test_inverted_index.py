@@ -0,0 +1,71 @@
+"""
+Filtros por provincia/cantón/parroquia: el índice invertido debe devolver las
+mismas filas que un recorrido completo del catálogo, y los scores de los
+candidatos deben ser los mismos que sin filtro.
+"""
+import numpy as np
+import pytest
+
+from api.app.core.inverted_index import REGION_COLUMNS, InvertedIndex, normalize_value
+from api.app.core.scoring import build_prediction_matrix
+
+
+def brute_force(snapshot, **filters) -> np.ndarray:
+    mask = np.ones(len(snapshot), dtype=bool)
+    for col, value in filters.items():
+        values = snapshot.metadata[col].decode()
+        mask &= np.array([v is not None and v == v and normalize_value(v) == normalize_value(value) for v in values])
+    return np.flatnonzero(mask)
+
+
+def region_samples(snapshot, n: int = 15):
+    """
+    Combinaciones provincia/cantón/parroquia tomadas de filas reales del catálogo
+    """
+    rows = np.random.default_rng(3).choice(len(snapshot), size=min(n, len(snapshot)), replace=False)
+    for row in rows:
+        yield {col: snapshot.metadata[col][row] for col in REGION_COLUMNS}
+
+
+def test_single_column_lookups_match_full_scan(snapshot):
+    index = snapshot.region_index
+    for col in REGION_COLUMNS:
+        for value in index.values(col):
+            np.testing.assert_array_equal(index.lookup(col, value), brute_force(snapshot, **{col: value}))
+
+
+def test_combined_filters_match_full_scan(snapshot):
+    for region in region_samples(snapshot):
+        for cols in (["provincia"], ["provincia", "canton"], REGION_COLUMNS):
+            filters = {col: region[col] for col in cols if region[col] is not None}
+            np.testing.assert_array_equal(snapshot.region_index.query(**filters), brute_force(snapshot, **filters))
+
+
+def test_case_and_whitespace_insensitive(snapshot):
+    provincia = next(v for v in snapshot.metadata["provincia"].categories if v)
+    variant = f"  {provincia.lower()}  "
+    np.testing.assert_array_equal(
+        snapshot.region_index.query(provincia=variant), snapshot.region_index.query(provincia=provincia)
+    )
+
+
+def test_no_filters_and_unknown_values(snapshot):
+    assert snapshot.region_index.query(provincia=None, canton=None) is None
+    assert len(snapshot.region_index.query(provincia="Provincia inexistente")) == 0
+    with pytest.raises(KeyError):
+        snapshot.region_index.lookup("nombre", "x")
+
+
+def test_merges_values_that_normalize_equal():
+    codes = np.array([0, 1, -1, 2, 0], dtype=np.int32)
+    index = InvertedIndex({"provincia": (codes, ["Loja", "LOJA ", "Azuay"])})
+    np.testing.assert_array_equal(index.lookup("provincia", "loja"), [0, 1, 4])
+    np.testing.assert_array_equal(index.lookup("provincia", "Azuay"), [3])
+
+
+def test_filtered_scores_equal_full_catalog_scores(manager, snapshot, family_preferences):
+    for region, aggregated, present in zip(region_samples(snapshot), *family_preferences):
+        rows = snapshot.region_index.query(provincia=region["provincia"], canton=region["canton"])
+        full = manager.predict_matrix(build_prediction_matrix(snapshot.features, aggregated, present))
+        filtered = manager.predict_matrix(build_prediction_matrix(snapshot.features[rows], aggregated, present))
+        np.testing.assert_array_equal(filtered, full[rows])
@@ -0,0 +1,36 @@
+"""
+Códigos de texto del almacenamiento columnar: usan el entero más chico que
+alcanza y se decodifican igual en los bordes de cada tipo (el -1 de vacío).
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.app.core.storage import CategoricalColumn, code_dtype, ensure_columnar, load_columnar_frame
+
+
+@pytest.mark.parametrize("n_categories, dtype", [(0, np.int8), (128, np.int8), (129, np.int16), (32769, np.int32)])
+def test_code_dtype(n_categories, dtype):
+    assert code_dtype(n_categories) == dtype
+
+
+@pytest.mark.parametrize("n_categories", [128, 129, 32768])
+def test_categorical_column_at_dtype_limits(n_categories):
+    categories = [f"valor {i}" for i in range(n_categories)]
+    codes = np.array([0, n_categories - 1, -1], dtype=code_dtype(n_categories))
+    column = CategoricalColumn(codes, categories)
+    assert [column[i] for i in range(3)] == ["valor 0", f"valor {n_categories - 1}", None]
+    assert column.decode()[1] == f"valor {n_categories - 1}"
+    assert column.decode()[2] != column.decode()[2]  # NaN
+
+
+def test_columnar_round_trip(tmp_path):
+    names = [f"destino {i % 200}" if i % 7 else None for i in range(1000)]
+    df = pd.DataFrame({"nota": np.arange(1000, dtype=float), "nombre": names, "lat": np.linspace(-4, 1, 1000).round(4)})
+    path = tmp_path / "tabla.csv"
+    df.to_csv(path, sep="|", index=False)
+    loaded = load_columnar_frame(ensure_columnar(str(path), ["nota"]))
+    assert loaded["nombre"].cat.codes.dtype == np.int16
+    assert loaded["nombre"].astype(object).where(loaded["nombre"].notna(), None).tolist() == names
+    assert loaded["lat"].dtype == np.float64  # solo el snapshot del catálogo la reduce a float32
+    np.testing.assert_array_equal(loaded["lat"], df["lat"])
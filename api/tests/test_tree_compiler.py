@@ -0,0 +1,57 @@
+"""
+El bosque compilado (NumPy) frente a booster.predict. Suma los árboles en otro
+orden que XGBoost, así que solo se exige igualdad hasta ATOL (diferencia
+máxima medida con el modelo de arranque: ~4e-6).
+"""
+import numpy as np
+import pytest
+import xgboost
+
+from api.app.core.scoring import build_prediction_matrix
+from api.app.core.tree_compiler import CompiledForest, compile_model
+
+ATOL = 1e-5
+
+
+@pytest.fixture(scope="module")
+def forest(manager):
+    return compile_model(manager.model)
+
+
+def booster_predict(manager, X: np.ndarray) -> np.ndarray:
+    return manager.model.get_booster().predict(
+        xgboost.DMatrix(X, missing=np.nan, feature_names=manager.feature_columns)
+    )
+
+
+def test_structure(manager, forest):
+    assert forest.num_trees == manager.model.get_booster().num_boosted_rounds()
+    assert forest.num_feature == len(manager.feature_columns)
+
+
+def test_training_features(manager, forest):
+    X = manager._load_data()[manager.feature_columns].to_numpy(dtype=np.float32)
+    np.testing.assert_allclose(forest.predict(X), booster_predict(manager, X), rtol=0, atol=ATOL)
+
+
+def test_family_matrices(manager, forest, snapshot, family_preferences):
+    for aggregated, present in zip(*family_preferences):
+        X = build_prediction_matrix(snapshot.features, aggregated, present)
+        np.testing.assert_allclose(forest.predict(X), booster_predict(manager, X), rtol=0, atol=ATOL)
+
+
+def test_missing_values_follow_default_direction(manager, forest, snapshot):
+    X = np.array(snapshot.features, dtype=np.float32)
+    X[np.random.default_rng(2).random(X.shape) < 0.2] = np.nan
+    np.testing.assert_allclose(forest.predict(X), booster_predict(manager, X), rtol=0, atol=ATOL)
+
+
+def test_chunking_does_not_change_scores(forest, snapshot):
+    X = np.asarray(snapshot.features)
+    np.testing.assert_array_equal(forest.predict(X, rows_per_chunk=7), forest.predict(X))
+
+
+def test_save_and_load(forest, snapshot, tmp_path):
+    loaded = CompiledForest.load(forest.save(str(tmp_path / "model.forest.npz")))
+    X = np.asarray(snapshot.features)
+    np.testing.assert_array_equal(loaded.predict(X), forest.predict(X))
@@ -1,95 +1,174 @@
-import pandas as pd
-import numpy as np
-import random
+'''
+Genera el dataset de entrenamiento: reseñas reales más filas sintéticas.
 
-from sklearn.model_selection import train_test_split
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
+Uso:
+    python generar_data_sintetica_entrenar_modelo.py [--input reseñas_con_atractivos_turisticos.csv]
+        [--output datos_sintetico.csv] [--n-sinteticos 3000] [--seed N] [--no-columnar] [--no-catalogo]
+'''
+import argparse
+from contextlib import nullcontext
 
-from category_encoders import TargetEncoder
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+import pandas as pd
+import numpy as np
 
-from xgboost import XGBRegressor
+from api.app.core.storage import columnar_dir, file_signature, save_columnar
+from api.app.core.destinations import ensure_destination_catalog
 
-# =======================================================
-# Cargar Dataset
-# =======================================================
-df = pd.read_csv("reseñas_con_atractivos_turisticos.csv", sep="|")
+INPUT_PATH = "reseñas_con_atractivos_turisticos.csv"
+OUTPUT_PATH = "datos_sintetico.csv"
+N = 3000
 
-# =======================================================
-# columnas
-# =======================================================
-num_cols = [c for c in df.columns if "Calif promedio" in c]
 cat_cols = ["provincia", "canton", "parroquia"]
+target = "score"
 
-# =======================================================
-# eliminar columnas NO deseadas
-# =======================================================
-df = df.drop(columns=[
-    "ID unico de usuario",
-    "user_id",
-    "desc_",
-    "desc2",
-    "desc3"
-], errors="ignore")
 
-# =======================================================
-# Crear SCORE
-# =======================================================
-df["score"] = df[num_cols].mean(axis=1)
-target = "score"
+def _no_stage(name):
+    return nullcontext()
 
-# =======================================================
-# Eliminar filas vacías
-# =======================================================
-df = df.dropna(subset=num_cols + cat_cols)
 
 # =======================================================
-# Generar Datos Sintéticos
+# Cargar Dataset
 # =======================================================
+def cargar_dataset(input_path=INPUT_PATH):
+    return pd.read_csv(input_path, sep="|")
 
-N = 3000
-sintetico = pd.DataFrame()
-
-# ---------- Simulación multivariada ----------
-cov_matrix = np.cov(df[num_cols].values.T)
-mean_vector = df[num_cols].mean().values
 
-vals = np.random.multivariate_normal(
-    mean=mean_vector,
-    cov=cov_matrix * 0.4,
-    size=N
-)
+def columnas_numericas(df):
+    return [c for c in df.columns if "Calif promedio" in c]
 
-for i, col in enumerate(num_cols):
-    sintetico[col] = np.clip(vals[:, i], 0, 5)
 
-# ---------- Categóricas realistas ----------
-pc_map = df.groupby("provincia")["canton"].unique().to_dict()
-cp_map = df.groupby("canton")["parroquia"].unique().to_dict()
-provincias = df["provincia"].unique()
+def preparar(df, num_cols):
+    """
+    Elimina columnas no deseadas, crea el score y descarta filas vacías
+    """
+    df = df.drop(columns=[
+        "ID unico de usuario",
+        "user_id",
+        "desc_",
+        "desc2",
+        "desc3"
+    ], errors="ignore")
 
-def generar_registro_categ():
-    prov = np.random.choice(provincias)
-    canton = np.random.choice(pc_map[prov])
-    parroquia = np.random.choice(cp_map[canton])
-    return prov, canton, parroquia
+    df["score"] = df[num_cols].mean(axis=1)
 
-cats = [generar_registro_categ() for _ in range(N)]
-cats = pd.DataFrame(cats, columns=cat_cols)
-sintetico[cat_cols] = cats
+    df = df.dropna(subset=num_cols + cat_cols)
+    return df
 
-# ---------- Score sintético ----------
-sintetico["score"] = sintetico[num_cols].mean(axis=1)
 
 # =======================================================
-# Unir datos
+# Generar Datos Sintéticos
 # =======================================================
-df_final = pd.concat([df, sintetico], ignore_index=True)
-
-print(f"Datos sintéticos generados: {len(sintetico)} filas")
-print(f"Dataset final para entrenamiento: {len(df_final)} filas")
-
-df_final.to_csv("datos_sintetico.csv", sep="|", index=False)
-print("Dataset combinado guardado")
+def sintetizar_numericas(df, num_cols, n=N):
+    """
+    Simulación multivariada con la media y covarianza de los datos reales
+    """
+    sintetico = pd.DataFrame()
+
+    cov_matrix = np.cov(df[num_cols].values.T)
+    mean_vector = df[num_cols].mean().values
+
+    vals = np.random.multivariate_normal(
+        mean=mean_vector,
+        cov=cov_matrix * 0.4,
+        size=n
+    )
+
+    for i, col in enumerate(num_cols):
+        sintetico[col] = np.clip(vals[:, i], 0, 5)
+    return sintetico
+
+
+def sintetizar_categoricas(df, sintetico, n=N):
+    """
+    Provincia, cantón y parroquia consistentes con los datos reales
+    """
+    pc_map = df.groupby("provincia")["canton"].unique().to_dict()
+    cp_map = df.groupby("canton")["parroquia"].unique().to_dict()
+    provincias = df["provincia"].unique()
+
+    def generar_registro_categ():
+        prov = np.random.choice(provincias)
+        canton = np.random.choice(pc_map[prov])
+        parroquia = np.random.choice(cp_map[canton])
+        return prov, canton, parroquia
+
+    cats = [generar_registro_categ() for _ in range(n)]
+    cats = pd.DataFrame(cats, columns=cat_cols)
+    sintetico[cat_cols] = cats
+    return sintetico
+
+
+def unir(df, sintetico, num_cols):
+    sintetico["score"] = sintetico[num_cols].mean(axis=1)
+    return pd.concat([df, sintetico], ignore_index=True)
+
+
+def run(
+    input_path=INPUT_PATH,
+    output_path=OUTPUT_PATH,
+    n_sinteticos=N,
+    seed=None,
+    columnar=True,
+    catalogo=True,
+    stage=_no_stage,
+):
+    """
+    Ejecuta el pipeline completo. 'stage(nombre)' devuelve un context manager
+    que envuelve cada etapa (lo usa api/benchmarks/etl_pipeline.py para medirlas).
+    """
+    if seed is not None:
+        np.random.seed(seed)
+    with stage("cargar"):
+        df = cargar_dataset(input_path)
+        num_cols = columnas_numericas(df)
+    with stage("preparar"):
+        df = preparar(df, num_cols)
+    with stage("sintetizar_numericas"):
+        sintetico = sintetizar_numericas(df, num_cols, n_sinteticos)
+    with stage("sintetizar_categoricas"):
+        sintetico = sintetizar_categoricas(df, sintetico, n_sinteticos)
+    with stage("unir"):
+        df_final = unir(df, sintetico, num_cols)
+
+    print(f"Datos sintéticos generados: {len(sintetico)} filas")
+    print(f"Dataset final para entrenamiento: {len(df_final)} filas")
+
+    with stage("guardar_csv"):
+        df_final.to_csv(output_path, sep="|", index=False)
+    print("Dataset combinado guardado")
+
+    if columnar:
+        # Copia columnar (features float32 + metadatos) que la API abre con memory-map
+        with stage("guardar_columnar"):
+            save_columnar(df_final, columnar_dir(output_path), num_cols, source=file_signature(output_path))
+        print("Dataset columnar guardado")
+
+    if catalogo:
+        # Catálogo de destinos para la API: una fila por lugar con nombre, sin filas sintéticas
+        with stage("catalogo"):
+            ensure_destination_catalog(output_path, num_cols)
+    return df_final
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera el dataset de entrenamiento con datos sintéticos")
+    parser.add_argument("--input", default=INPUT_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--n-sinteticos", type=int, default=N)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-columnar", action="store_true", help="No escribir la copia columnar")
+    parser.add_argument("--no-catalogo", action="store_true", help="No construir el catálogo de destinos")
+    args = parser.parse_args(argv)
+
+    run(
+        args.input,
+        args.output,
+        n_sinteticos=args.n_sinteticos,
+        seed=args.seed,
+        columnar=not args.no_columnar,
+        catalogo=not args.no_catalogo,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,25 @@
 '''
 ESTE CODIGO FUSIONA LOS DOS DATASETS BASE Y DEJ ACOMO RESULTADO EL 'reseñas_con_atractivos_turisticos' CON
 UN TOTAL DE 1133 REGISTROS
+
+Uso:
+    python union_y_preprocesamiento.py [--atractivos datasets_base/atractivos_tur.csv]
+        [--ratings datasets_base/google_review_ratings.csv]
+        [--output reseñas_con_atractivos_turisticos.csv] [--no-columnar]
 '''
 
+import re
+import argparse
+from contextlib import nullcontext
+
 import pandas as pd
 import numpy as np
 
-# ------------------------------------------------------
-# Cargar datasets
-# ------------------------------------------------------
-df_atractivos = pd.read_csv('datasets_base/atractivos_tur.csv')
-df_ratings = pd.read_csv('datasets_base/google_review_ratings.csv')
+from api.app.core.storage import columnar_dir, file_signature, save_columnar
 
-# ------------------------------------------------------
-# Eliminar columnas vacías tipo "Unnamed"
-# ------------------------------------------------------
-df_ratings = df_ratings.loc[:, ~df_ratings.columns.str.contains('^Unnamed')]
+ATRACTIVOS_PATH = 'datasets_base/atractivos_tur.csv'
+RATINGS_PATH = 'datasets_base/google_review_ratings.csv'
+OUTPUT_PATH = 'reseñas_con_atractivos_turisticos.csv'
 
 # ------------------------------------------------------
 # Lista correcta de columnas (25)
@@ -49,17 +53,7 @@ nuevos_nombres_es = [
 ]
 
 # ------------------------------------------------------
-# Renombrar columnas de ratings
-# ------------------------------------------------------
-if len(df_ratings.columns) == len(nuevos_nombres_es):
-    df_ratings.columns = nuevos_nombres_es
-else:
-    raise ValueError(
-        f"ERROR: El CSV tiene {len(df_ratings.columns)} columnas, pero la lista tiene 25 nombres."
-    )
-
-# ------------------------------------------------------
-# Seleccionar columnas del dataset de atractivos
+# Columnas del dataset de atractivos
 # ------------------------------------------------------
 columnas_deseadas = [
     'provincia', 'canton', 'parroquia',
@@ -67,36 +61,60 @@ columnas_deseadas = [
     'lat', 'lon'
 ]
 
-df_atractivos = df_atractivos[columnas_deseadas].copy()
+
+def _no_stage(name):
+    return nullcontext()
+
 
 # ------------------------------------------------------
-# LIMPIEZA Y PREPROCESAMIENTO PROFUNDO
+# Cargar datasets
 # ------------------------------------------------------
+def cargar_datasets(atractivos_path=ATRACTIVOS_PATH, ratings_path=RATINGS_PATH):
+    df_atractivos = pd.read_csv(atractivos_path)
+    df_ratings = pd.read_csv(ratings_path)
+    return df_atractivos, df_ratings
+
+
+def preparar_ratings(df_ratings):
+    """
+    Elimina columnas vacías tipo "Unnamed" y renombra las 25 columnas de ratings
+    """
+    df_ratings = df_ratings.loc[:, ~df_ratings.columns.str.contains('^Unnamed')]
+
+    if len(df_ratings.columns) == len(nuevos_nombres_es):
+        df_ratings.columns = nuevos_nombres_es
+    else:
+        raise ValueError(
+            f"ERROR: El CSV tiene {len(df_ratings.columns)} columnas, pero la lista tiene 25 nombres."
+        )
+    return df_ratings
+
 
-# Reemplazar espacios vacíos por NaN
-df_ratings.replace(r'^\s*$', np.nan, regex=True, inplace=True)
-df_atractivos.replace(r'^\s*$', np.nan, regex=True, inplace=True)
+def seleccionar_atractivos(df_atractivos):
+    return df_atractivos[columnas_deseadas].copy()
 
-# Rellenar columnas numéricas con 0
-num_cols = df_ratings.select_dtypes(include=[np.number]).columns
-df_ratings[num_cols] = df_ratings[num_cols].fillna(0)
 
-# Rellenar textos vacíos con “Sin información”
-text_cols = df_atractivos.select_dtypes(include=['object']).columns
-df_atractivos[text_cols] = df_atractivos[text_cols].fillna("Sin información")
+# Mojibake (UTF-8 leído como Latin-1) en las descripciones y su carácter correcto
+MOJIBAKE = [("Ã¡", "á"), ("Ã©", "é"), ("Ã­", "í"), ("Ã³", "ó"), ("Ãº", "ú"), ("Ã±", "ñ")]
+MOJIBAKE_UTF8 = {roto.encode("utf-8"): bueno.encode("utf-8") for roto, bueno in MOJIBAKE}
+MOJIBAKE_RE = re.compile(b"|".join(re.escape(roto) for roto in MOJIBAKE_UTF8))
+# Saltos de línea y '|' (separador del CSV de salida) a espacio, ';' a ','
+TABLA_LIMPIEZA = bytes.maketrans(b"\n\r|;", b"   ,")
+# Une los valores de una columna para limpiarlos en bloque; el tamaño del
+# bloque acota la memoria extra del texto unido
+SEPARADOR = "\x00"
+FILAS_POR_BLOQUE = 20000
 
-# Arreglar encoding roto en descripciones
+
+# Arreglar encoding roto en descripciones (versión por valor)
 def fix_encoding(x):
     x = str(x)
-    x = x.replace("Ã¡","á").replace("Ã©","é").replace("Ã­","í")
-    x = x.replace("Ã³","ó").replace("Ãº","ú").replace("Ã±","ñ")
+    for roto, bueno in MOJIBAKE:
+        x = x.replace(roto, bueno)
     return x
 
-for col in ['desc_', 'desc2', 'desc3']:
-    if col in df_atractivos.columns:
-        df_atractivos[col] = df_atractivos[col].apply(fix_encoding)
 
-# Limpiar saltos de línea y caracteres
+# Limpiar saltos de línea y caracteres (versión por valor)
 def limpiar_texto(x):
     if pd.isna(x):
         return "Sin información"
@@ -107,34 +125,156 @@ def limpiar_texto(x):
     x = x.replace(";", ",")
     return x.strip()
 
-for col in df_atractivos.columns:
-    if df_atractivos[col].dtype == object:
-        df_atractivos[col] = df_atractivos[col].apply(limpiar_texto)
 
-# Validar coordenadas
-df_atractivos['lat'] = pd.to_numeric(df_atractivos['lat'], errors='coerce').fillna(0)
-df_atractivos['lon'] = pd.to_numeric(df_atractivos['lon'], errors='coerce').fillna(0)
+def _limpiar_bloque(valores, mojibake):
+    texto = SEPARADOR.join(valores)
+    if texto.count(SEPARADOR) != len(valores) - 1:
+        # Algún valor contiene el separador: limpieza valor por valor
+        return [limpiar_texto(fix_encoding(v) if mojibake else v) for v in valores]
 
-# ------------------------------------------------------
-# Empatar número de filas
-# ------------------------------------------------------
-n_filas = min(len(df_ratings), len(df_atractivos))
-df_ratings = df_ratings.head(n_filas).reset_index(drop=True)
-df_atractivos = df_atractivos.head(n_filas).reset_index(drop=True)
+    datos = texto.encode("utf-8", "surrogatepass")
+    if mojibake:
+        datos = MOJIBAKE_RE.sub(lambda m: MOJIBAKE_UTF8[m.group()], datos)
+    datos = datos.translate(TABLA_LIMPIEZA)
+    partes = datos.decode("utf-8", "surrogatepass").split(SEPARADOR)
+    # Conserva el objeto original si el valor no cambió (no duplica la columna en memoria)
+    return [v if p == v else p for p, v in zip((p.strip() for p in partes), valores)]
+
+
+def limpiar_columna(serie, mojibake=False):
+    """
+    Versión vectorizada de fix_encoding (si mojibake) + limpiar_texto para una
+    columna sin nulos: une cada bloque de valores en un solo texto UTF-8,
+    corrige el mojibake con una sola regex, aplica TABLA_LIMPIEZA con
+    bytes.translate y vuelve a separar. Los reemplazos son ASCII o secuencias
+    UTF-8 completas, así que nunca cruzan el límite entre dos valores.
+    """
+    if serie.empty:
+        return serie
+    valores = serie.astype(str).tolist()
+    limpios = []
+    for inicio in range(0, len(valores), FILAS_POR_BLOQUE):
+        limpios.extend(_limpiar_bloque(valores[inicio:inicio + FILAS_POR_BLOQUE], mojibake))
+    return pd.Series(limpios, index=serie.index, dtype=object)
+
+
+def vaciar_blancos(df):
+    """
+    Reemplaza por NaN los textos vacíos o solo con espacios. Equivale a
+    df.replace(r'^\\s*$', np.nan, regex=True) (que también reinfiere el tipo
+    de las columnas de texto) sin evaluar la regex celda por celda: solo se
+    revisan los valores distintos de cada columna y las celdas se marcan con isin.
+    """
+    for col in df.columns[df.dtypes == object]:
+        blancos = [v for v in pd.unique(df[col].to_numpy()) if isinstance(v, str) and not v.strip()]
+        if blancos:
+            df[col] = df[col].mask(df[col].isin(blancos)).infer_objects()
+    return df
 
-# ------------------------------------------------------
-# Fusionar datasets horizontalmente
-# ------------------------------------------------------
-df_final = pd.concat([df_ratings, df_atractivos], axis=1)
 
 # ------------------------------------------------------
-# Guardar en CSV 
+# LIMPIEZA Y PREPROCESAMIENTO PROFUNDO
 # ------------------------------------------------------
-df_final.to_csv(
-    'reseñas_con_atractivos_turisticos.csv',
-    index=False,
-    encoding='utf-8-sig',
-    sep='|'
-)
-
-print(f"Archivo generado correctamente con {n_filas} filas.")
+def limpiar_ratings(df_ratings):
+    # Reemplazar espacios vacíos por NaN
+    vaciar_blancos(df_ratings)
+
+    # Rellenar columnas numéricas con 0
+    num_cols = df_ratings.select_dtypes(include=[np.number]).columns
+    df_ratings[num_cols] = df_ratings[num_cols].fillna(0)
+    return df_ratings
+
+
+def limpiar_atractivos(df_atractivos):
+    # Reemplazar espacios vacíos por NaN
+    vaciar_blancos(df_atractivos)
+
+    # Rellenar textos vacíos con “Sin información”
+    text_cols = df_atractivos.select_dtypes(include=['object']).columns
+    df_atractivos[text_cols] = df_atractivos[text_cols].fillna("Sin información")
+
+    # Encoding roto en descripciones + saltos de línea y caracteres, una pasada por columna
+    for col in df_atractivos.columns:
+        descripcion = col in ('desc_', 'desc2', 'desc3')
+        if descripcion or df_atractivos[col].dtype == object:
+            df_atractivos[col] = limpiar_columna(df_atractivos[col], mojibake=descripcion)
+
+    # Validar coordenadas
+    df_atractivos['lat'] = pd.to_numeric(df_atractivos['lat'], errors='coerce').fillna(0)
+    df_atractivos['lon'] = pd.to_numeric(df_atractivos['lon'], errors='coerce').fillna(0)
+    return df_atractivos
+
+
+def fusionar(df_ratings, df_atractivos):
+    """
+    Empata el número de filas y fusiona los datasets horizontalmente
+    """
+    n_filas = min(len(df_ratings), len(df_atractivos))
+    df_ratings = df_ratings.head(n_filas).reset_index(drop=True)
+    df_atractivos = df_atractivos.head(n_filas).reset_index(drop=True)
+    return pd.concat([df_ratings, df_atractivos], axis=1)
+
+
+def guardar_csv(df_final, output_path=OUTPUT_PATH):
+    df_final.to_csv(
+        output_path,
+        index=False,
+        encoding='utf-8-sig',
+        sep='|'
+    )
+
+
+def guardar_columnar(df_final, output_path=OUTPUT_PATH):
+    # Copia columnar para cargas rápidas
+    save_columnar(
+        df_final,
+        columnar_dir(output_path),
+        nuevos_nombres_es[1:],
+        source=file_signature(output_path)
+    )
+
+
+def run(
+    atractivos_path=ATRACTIVOS_PATH,
+    ratings_path=RATINGS_PATH,
+    output_path=OUTPUT_PATH,
+    columnar=True,
+    stage=_no_stage,
+):
+    """
+    Ejecuta el pipeline completo. 'stage(nombre)' devuelve un context manager
+    que envuelve cada etapa (lo usa api/benchmarks/etl_pipeline.py para medirlas).
+    """
+    with stage("cargar"):
+        df_atractivos, df_ratings = cargar_datasets(atractivos_path, ratings_path)
+    with stage("preparar"):
+        df_ratings = preparar_ratings(df_ratings)
+        df_atractivos = seleccionar_atractivos(df_atractivos)
+    with stage("limpiar_ratings"):
+        df_ratings = limpiar_ratings(df_ratings)
+    with stage("limpiar_atractivos"):
+        df_atractivos = limpiar_atractivos(df_atractivos)
+    with stage("fusionar"):
+        df_final = fusionar(df_ratings, df_atractivos)
+    with stage("guardar_csv"):
+        guardar_csv(df_final, output_path)
+    if columnar:
+        with stage("guardar_columnar"):
+            guardar_columnar(df_final, output_path)
+    return df_final
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fusiona y limpia los datasets base")
+    parser.add_argument("--atractivos", default=ATRACTIVOS_PATH)
+    parser.add_argument("--ratings", default=RATINGS_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--no-columnar", action="store_true", help="No escribir la copia columnar")
+    args = parser.parse_args(argv)
+
+    df_final = run(args.atractivos, args.ratings, args.output, columnar=not args.no_columnar)
+    print(f"Archivo generado correctamente con {len(df_final)} filas.")
+
+
+if __name__ == "__main__":
+    main()